@@ -1,3 +1,4 @@
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -9,22 +10,114 @@ class Settings(BaseSettings):
     google_auth_url: str
     google_token_url: str
     google_redirect_uri: str
+    # Signing certificates for ID tokens (PEM by key id), cached per their Cache-Control max-age
+    google_certs_url: str = "https://www.googleapis.com/oauth2/v1/certs"
+    google_certs_default_max_age: int = 300  # when the response has no max-age
+    google_timeout: float = 10.0
+    google_max_connections: int = 10
     openai_key: str
     embedding_service_key: str
     max_embedding_retries: int
     embedding_retry_delay: float
     embedding_model: str
+    # Model switch: records are also embedded with the shadow model (dual-write) and,
+    # with shadow reads on, searches are replayed against it and compared in the logs.
+    # Cut over by swapping EMBEDDING_MODEL and EMBEDDING_SHADOW_MODEL.
+    embedding_shadow_model: Optional[str] = None
+    embedding_shadow_read: bool = False
+    # Per-model embedding service URLs; models not listed use embedding_service_url
+    embedding_service_urls: Dict[str, str] = {}
+    # Shared embedding-service HTTP client
+    embedding_timeout: float = 10.0
+    embedding_connect_timeout: float = 2.0
+    embedding_max_connections: int = 20
+    embedding_max_keepalive_connections: int = 10
+    embedding_keepalive_expiry: float = 30.0
+    embedding_http2: bool = False
+    embedding_batch_timeout: float = 30.0
+    embedding_batch_size: int = 100  # max inputs accepted by /embed/batch
+    # Record documents: all-mpnet-base-v2 truncates at 384 tokens, so long notes are chunked
+    embedding_chunk_size: int = 1000  # characters
+    embedding_chunk_overlap: int = 200
+    search_chunk_candidates: int = 100
+    # Default search mode: "semantic", "hybrid" or "lexical"; hybrid fuses vector and
+    # trigram/full-text ranks with reciprocal-rank fusion (score = sum 1 / (k + rank))
+    search_mode: str = "hybrid"
+    search_rrf_k: int = 60
+    # Answer short name-like hybrid queries from the trigram index alone when names match
+    search_lexical_fast_path: bool = True
+    # ...but only serves names-only results when the top name's word similarity reaches this
+    search_lexical_fast_path_min_similarity: float = 0.8
+    # /search/suggest embeds queries at least this long in the background
+    search_suggest_warm_min_length: int = 3
+    # ...with at most this many embedding requests in flight per process
+    search_suggest_max_warmups: int = 4
+    # Vector search plan: "auto" scans users with at most search_exact_scan_max_chunks
+    # chunks exactly and everyone else through the HNSW index; "exact"/"hnsw" force one
+    search_plan: str = "auto"
+    search_exact_scan_max_chunks: int = 10_000
+    search_plan_cache_ttl_seconds: float = 300.0
+    # pgvector HNSW query settings for the "hnsw" plan; iterative scans ("strict_order" or
+    # "relaxed_order") keep walking the index until the user filter yields enough rows
+    hnsw_ef_search: int = 100
+    hnsw_iterative_scan: str = "relaxed_order"
+    hnsw_max_scan_tuples: int = 20_000
+    # Index the HNSW pass runs on: "vector" (float32), "halfvec" (float16) or "binary"
+    # (1 bit per dimension, Hamming distance); quantized passes fetch
+    # quantized_rerank_factor times the candidates and re-rank them on the full vectors
+    vector_search_index: str = "vector"
+    quantized_rerank_factor: int = 4
+    # Vector wire format: "float" (JSON list), "base64" (float32) or "binary" (raw octet-stream)
+    embedding_encoding_format: str = "base64"
+    # In-process query embedding cache
+    embedding_cache_max_entries: int = 10_000
+    embedding_cache_max_bytes: int = 64 * 1024 * 1024
+    embedding_cache_ttl_seconds: Optional[float] = None
+    # Embedding job queue worker
+    embedding_worker_concurrency: int = 2
+    embedding_worker_poll_interval: float = 1.0
+    embedding_worker_stats_interval: float = 60.0
+    embedding_job_max_attempts: int = 5
+    embedding_job_retry_delay: float = 30.0
+    # How long a claimed job is hidden from other workers while it is being embedded
+    embedding_job_lease_seconds: float = 300.0
+    # Bulk record import
+    bulk_import_chunk_size: int = 1000
+    bulk_import_max_records: int = 10_000
+    # /records/import uploads are spooled to disk beyond this many bytes
+    bulk_import_spool_max_memory: int = 8 * 1024 * 1024
+    # ...and rejected with 413 beyond this many
+    bulk_import_max_upload_size: int = 64 * 1024 * 1024
+    # Shared second-level cache behind the in-process one: "postgres" or "none"
+    embedding_store: str = "postgres"
+    # The worker deletes shared entries older than this, in batches
+    embedding_store_ttl_seconds: float = 30 * 24 * 3600.0
+    embedding_store_purge_interval: float = 3600.0
+    embedding_store_purge_batch_size: int = 1000
     secret_key: str
     algorithm: str
+    # How long a user id verified against the users table is trusted without a lookup
+    auth_user_cache_ttl_seconds: float = 60.0
+    # Expired refresh tokens are deleted by the worker in batches
+    token_purge_interval: float = 3600.0
+    token_purge_batch_size: int = 1000
 
     @property
     def database_url(self) -> str:
+        return f"postgresql+asyncpg://{self.postgres_user}:{self.postgres_password}@db:5432/{self.postgres_db}"
+
+    @property
+    def sync_database_url(self) -> str:
+        # Alembic and the maintenance scripts still run on psycopg2
         return f"postgresql+psycopg2://{self.postgres_user}:{self.postgres_password}@db:5432/{self.postgres_db}"
 
     @property
     def embedding_service_url(self) -> str:
         return "http://embedding-service:8080/embed"
 
+    def embedding_service_url_for(self, model: str) -> str:
+        return self.embedding_service_urls.get(model, self.embedding_service_url)
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8"
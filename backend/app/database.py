@@ -1,15 +1,37 @@
-from sqlalchemy import create_engine
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from pgvector.asyncpg import register_vector
+from pgvector.sqlalchemy import VECTOR
 from app.config import settings
 
-engine = create_engine(settings.database_url)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = create_async_engine(settings.database_url)
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+@event.listens_for(engine.sync_engine, "connect")
+def _register_vector(dbapi_connection, connection_record):
+    # Teach asyncpg how to encode/decode the pgvector `vector` type (binary wire format)
+    dbapi_connection.run_async(register_vector)
+
+
+class Vector(VECTOR):
+    """pgvector column type for the asyncpg codec registered above.
+
+    pgvector's own type binds vectors as text, which the binary codec rejects;
+    this one hands lists/ndarrays to the codec unchanged and returns float32 ndarrays.
+    """
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        return None
+
+    def result_processor(self, dialect, coltype):
+        def process(value):
+            return None if value is None else value.to_numpy()
+        return process
+
+
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
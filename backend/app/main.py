@@ -1,10 +1,16 @@
 import logging
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2AuthorizationCodeBearer
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base, SessionLocal
+from app.database import engine, Base, SessionLocal, get_db
 from app.routers import auth, records, search, tags
 from app.config import settings
+from app.services.embedding import init_http_client, close_http_client, embedding_cache
+from app.services import google_auth
+from app.tasks.embeddings import embedding_backfill_stats, embedding_queue_stats
+from app.utils.security import get_current_user
 
 logging.basicConfig(
     level=logging.DEBUG,
@@ -14,13 +20,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="PeoplePad MVP")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_http_client()
+    await google_auth.init_http_client()
+    yield
+    await close_http_client()
+    await google_auth.close_http_client()
+    await engine.dispose()
+
+app = FastAPI(title="PeoplePad MVP", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],  # Your Vite dev server
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # OAuth2 configuration for Google
@@ -39,3 +55,17 @@ app.include_router(tags.router)
 @app.get("/")
 async def root():
     return {"message": "PeoplePad MVP API"}
+
+# Operational stats are for signed-in users only; the backfill count scans records
+@app.get("/stats/embedding-cache", dependencies=[Depends(get_current_user)])
+async def embedding_cache_stats():
+    return embedding_cache.stats()
+
+@app.get("/stats/embedding-queue", dependencies=[Depends(get_current_user)])
+async def embedding_queue_depth(db: AsyncSession = Depends(get_db)):
+    return await embedding_queue_stats(db)
+
+
+@app.get("/stats/embedding-backfill", dependencies=[Depends(get_current_user)])
+async def embedding_backfill_progress(db: AsyncSession = Depends(get_db)):
+    return await embedding_backfill_stats(db)
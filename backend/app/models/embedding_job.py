@@ -0,0 +1,23 @@
+from sqlalchemy import Index, Column, String, Integer, BigInteger, DateTime, ForeignKey, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from app.database import Base
+
+class EmbeddingJob(Base):
+    __tablename__ = "embedding_jobs"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    record_id = Column(UUID(as_uuid=True), ForeignKey("records.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String, nullable=False, server_default="pending")  # pending | dead
+    attempts = Column(Integer, nullable=False, server_default="0")
+    last_error = Column(String, nullable=True)
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # At most one pending job per record; re-enqueueing is a no-op
+        Index('uq_embedding_jobs_pending_record_id', 'record_id', unique=True,
+              postgresql_where=text("status = 'pending'")),
+        Index('idx_embedding_jobs_pending_run_after', 'run_after',
+              postgresql_where=text("status = 'pending'")),
+    )
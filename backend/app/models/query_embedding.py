@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, DateTime, Index, PrimaryKeyConstraint
+from sqlalchemy.sql import func
+from app.database import Base, Vector
+
+class QueryEmbedding(Base):
+    __tablename__ = "query_embeddings"
+
+    model = Column(String, nullable=False)
+    text_hash = Column(String, nullable=False)
+    embedding = Column(Vector(768), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        PrimaryKeyConstraint('model', 'text_hash', name='query_embeddings_pkey'),
+        # The worker purges entries older than embedding_store_ttl_seconds
+        Index('idx_query_embeddings_created_at', 'created_at'),
+    )
@@ -1,9 +1,8 @@
-from sqlalchemy import Index, Column, String, DateTime, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
-from pgvector.sqlalchemy import Vector
+from sqlalchemy import Index, Column, Computed, String, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
-from app.database import Base
+from sqlalchemy.orm import deferred, relationship
+from app.database import Base, Vector
 import uuid
 
 class Record(Base):
@@ -14,12 +13,22 @@ class Record(Base):
     name = Column(String, nullable=False)
     notes = Column(String, nullable=True)
     all_mpnet_base_v2_embedding = Column(Vector(768), nullable=True)
+    # sha256 of the text the stored embedding was computed from
+    embedding_source_hash = Column(String(64), nullable=True)
+    # Full-text vector for hybrid search; maintained by Postgres, never loaded by default
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed("to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(notes, ''))", persisted=True),
+    ))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     __table_args__ = (
         Index('idx_records_all_mpnet_base_v2_embedding', 'all_mpnet_base_v2_embedding', postgresql_using='hnsw',
               postgresql_ops={'all_mpnet_base_v2_embedding': 'vector_cos_ops'}),
+        Index('idx_records_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        Index('idx_records_notes_trgm', 'notes', postgresql_using='gin', postgresql_ops={'notes': 'gin_trgm_ops'}),
+        Index('idx_records_search_vector', 'search_vector', postgresql_using='gin'),
     )
     # Add relationship to fetch tags
     tags = relationship(
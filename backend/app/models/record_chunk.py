@@ -0,0 +1,33 @@
+from sqlalchemy import Index, Column, Integer, ForeignKey, UniqueConstraint, cast, func
+from sqlalchemy.dialects.postgresql import UUID
+from pgvector.sqlalchemy import HALFVEC, BIT
+from app.database import Base, Vector
+import uuid
+
+EMBEDDING_DIMENSIONS = 768
+
+class RecordChunk(Base):
+    """One embedded window of a record's composed document (name + tags + notes)."""
+    __tablename__ = "record_chunks"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    record_id = Column(UUID(as_uuid=True), ForeignKey("records.id", ondelete="CASCADE"), nullable=False)
+    # Denormalized from records so the vector search can filter by owner without a join
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    chunk_index = Column(Integer, nullable=False)
+    all_mpnet_base_v2_embedding = Column(Vector(EMBEDDING_DIMENSIONS), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint('record_id', 'chunk_index', name='record_chunks_record_id_chunk_index_key'),
+        Index('idx_record_chunks_all_mpnet_base_v2_embedding', 'all_mpnet_base_v2_embedding', postgresql_using='hnsw',
+              postgresql_ops={'all_mpnet_base_v2_embedding': 'vector_cosine_ops'},
+              postgresql_with={'m': 24, 'ef_construction': 128}),
+        # Quantized expression indexes for settings.vector_search_index; the full
+        # vectors stay in the table for re-ranking
+        Index('idx_record_chunks_all_mpnet_base_v2_embedding_halfvec',
+              cast(all_mpnet_base_v2_embedding, HALFVEC(EMBEDDING_DIMENSIONS)).label('halfvec_embedding'),
+              postgresql_using='hnsw', postgresql_ops={'halfvec_embedding': 'halfvec_cosine_ops'}),
+        Index('idx_record_chunks_all_mpnet_base_v2_embedding_binary',
+              cast(func.binary_quantize(all_mpnet_base_v2_embedding), BIT(EMBEDDING_DIMENSIONS)).label('binary_embedding'),
+              postgresql_using='hnsw', postgresql_ops={'binary_embedding': 'bit_hamming_ops'}),
+    )
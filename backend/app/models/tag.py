@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, UniqueConstraint
+from sqlalchemy import Index, Column, Computed, String, ForeignKey, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -10,6 +10,8 @@ class Tag(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     name = Column(String, nullable=False)
+    # Lowercased name for case-insensitive prefix filters; maintained by Postgres
+    normalized_name = Column(String, Computed("lower(name)", persisted=True))
 
     # Add relationship to records
     records = relationship(
@@ -20,10 +22,17 @@ class Tag(Base):
 
     __table_args__ = (
         UniqueConstraint('user_id', 'name', name='tags_user_id_name_key'),
+        Index('idx_tags_user_id_normalized_name', 'user_id', 'normalized_name',
+              postgresql_ops={'normalized_name': 'text_pattern_ops'}),
     )
 
 class RecordTag(Base):
     __tablename__ = "record_tags"
 
     record_id = Column(UUID(as_uuid=True), ForeignKey("records.id"), primary_key=True)
-    tag_id = Column(UUID(as_uuid=True), ForeignKey("tags.id"), primary_key=True)
\ No newline at end of file
+    tag_id = Column(UUID(as_uuid=True), ForeignKey("tags.id"), primary_key=True)
+
+    __table_args__ = (
+        # The primary key leads with record_id; tag filters go from tag to records
+        Index('idx_record_tags_tag_id_record_id', 'tag_id', 'record_id'),
+    )
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, DateTime
+from sqlalchemy import Column, String, ForeignKey, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
 from datetime import datetime
@@ -8,8 +8,14 @@ class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    # Token identifier carried in the refresh JWT's "jti" claim; /auth/refresh looks tokens up by it
+    jti = Column(UUID(as_uuid=True), nullable=False, unique=True, default=uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
     hashed_token = Column(String, nullable=False)
     salt = Column(String, nullable=False)  # New: Store salt for hashing
     expires_at = Column(DateTime, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_refresh_tokens_expires_at', 'expires_at'),
+    )
@@ -1,53 +1,151 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import ValidationError
+from sqlalchemy import select, delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database import get_db, SessionLocal
 from app.models.record import Record
-from app.models.tag import Tag, RecordTag
-from app.schemas.record import RecordCreate, RecordUpdate, RecordResponse
-from app.tasks.embeddings import compute_embedding
+from app.models.tag import RecordTag
+from app.schemas.record import RecordCreate, RecordUpdate, RecordResponse, RecordBulkCreate, RecordBulkResponse
+from app.services.tags import upsert_tags
+from app.services.record_import import (
+    UploadTooLargeError, insert_records, iter_csv_rows, iter_file, iter_ndjson_rows, spool_stream,
+)
+from app.tasks.embeddings import enqueue_embedding_jobs
+from app.services.embedding import embedding_column_name, embedding_models, embedding_source_hash
+from app.services.documents import compose_document
 from uuid import UUID
 from app.utils.security import get_current_user
+import json
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/records",
-                   tags=["records"],
-                   dependencies=[Depends(get_current_user)])
+# Every route takes user_id from get_current_user, so no router-level dependency
+router = APIRouter(prefix="/records", tags=["records"])
+
+async def get_user_record(db: AsyncSession, id: UUID, user_id: UUID):
+    # populate_existing reloads server defaults and the joined tags after a write
+    result = await db.execute(
+        select(Record)
+        .where(Record.id == id, Record.user_id == user_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.unique().scalar_one_or_none()
 
 @router.post("/", response_model=RecordResponse)
 async def create_record(
     record: RecordCreate,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: UUID = Depends(get_current_user),
 ):
     db_record = Record(user_id=user_id, name=record.name, notes=record.notes)
     db.add(db_record)
-    db.commit()
-    db.refresh(db_record)
+    await db.flush()
+
+    # Handle tags: one upsert, one bulk link insert, one transaction
+    tag_ids = await upsert_tags(db, user_id, record.tags)
+    if tag_ids:
+        await db.execute(
+            insert(RecordTag),
+            [{"record_id": db_record.id, "tag_id": tag_id} for tag_id in tag_ids.values()],
+        )
+
+    # Queue the embedding in the same transaction so it can't be lost
+    await enqueue_embedding_jobs(db, [db_record.id])
+    await db.commit()
+
+    return await get_user_record(db, db_record.id, user_id)
+
+@router.post("/bulk", response_model=RecordBulkResponse)
+async def create_records_bulk(
+    data: RecordBulkCreate,
+    db: AsyncSession = Depends(get_db),
+    user_id: UUID = Depends(get_current_user),
+):
+    if len(data.records) > settings.bulk_import_max_records:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many records, max {settings.bulk_import_max_records}; use /records/import to stream larger files",
+        )
 
-    # Handle tags
-    for tag_name in record.tags:
-        tag = db.query(Tag).filter(Tag.user_id == user_id, Tag.name == tag_name).first()
-        if not tag:
-            tag = Tag(user_id=user_id, name=tag_name)
-            db.add(tag)
-            db.commit()
-            db.refresh(tag)
-        db.add(RecordTag(record_id=db_record.id, tag_id=tag.id))
-    db.commit()
+    created = []
+    chunk_size = settings.bulk_import_chunk_size
+    for start in range(0, len(data.records), chunk_size):
+        created.extend(await insert_records(db, user_id, data.records[start:start + chunk_size]))
 
-    # Launch async embedding task
-    background_tasks.add_task(compute_embedding, db_record.id, record.notes, db)
+    return RecordBulkResponse(created=len(created), ids=created)
 
-    return db_record
+@router.post("/import")
+async def import_records(
+    request: Request,
+    user_id: UUID = Depends(get_current_user),
+):
+    """Import an NDJSON (one RecordCreate per line) or CSV (`name,notes,tags`) upload.
+
+    The body is spooled to a temporary file first: StreamingResponse listens for
+    client disconnects on the same receive channel, so the body can't be read
+    from inside the response generator; uploads over bulk_import_max_upload_size
+    bytes get a 413. Rows are then inserted in chunks and
+    the response is an NDJSON progress stream ending with a summary line.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == "text/csv":
+        parse_rows = iter_csv_rows
+    elif content_type in ("application/x-ndjson", "application/jsonl"):
+        parse_rows = iter_ndjson_rows
+    else:
+        raise HTTPException(status_code=415, detail="Expected text/csv or application/x-ndjson")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > settings.bulk_import_max_upload_size:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {settings.bulk_import_max_upload_size} bytes")
+    try:
+        upload = await spool_stream(
+            request.stream(), settings.bulk_import_spool_max_memory, settings.bulk_import_max_upload_size
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    rows = parse_rows(iter_file(upload))
+
+    async def progress():
+        imported = 0
+        errors = []
+        chunk = []
+        # The request-scoped session is closed before the response streams, so use our own
+        async with SessionLocal() as db:
+            async def flush():
+                nonlocal imported
+                created = await insert_records(db, user_id, chunk)
+                imported += len(created)
+                chunk.clear()
+                return json.dumps({"imported": imported, "errors": len(errors)}) + "\n"
+
+            try:
+                async for line_number, row in rows:
+                    try:
+                        chunk.append(RecordCreate.model_validate(row))
+                    except ValidationError as e:
+                        errors.append({"line": line_number, "error": str(e)})
+                        continue
+                    if len(chunk) >= settings.bulk_import_chunk_size:
+                        yield await flush()
+                if chunk:
+                    yield await flush()
+            except (ValueError, UnicodeDecodeError) as e:
+                # Malformed NDJSON/CSV stops the import; chunks already flushed stay committed
+                logger.error(f"Record import aborted after {imported} records: {e}")
+                errors.append({"error": f"Import aborted: {e}"})
+        yield json.dumps({"done": True, "imported": imported, "errors": errors[:100]}) + "\n"
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson", background=BackgroundTask(upload.close))
 
 @router.get("/{id}", response_model=RecordResponse)
-async def get_record(id: UUID, db: Session = Depends(get_db), user_id: UUID = Depends(get_current_user)):
-    record = db.query(Record).filter(Record.id == id, Record.user_id == user_id).first()
+async def get_record(id: UUID, db: AsyncSession = Depends(get_db), user_id: UUID = Depends(get_current_user)):
+    record = await get_user_record(db, id, user_id)
     if not record:
         raise HTTPException(status_code=404, detail="Record not found")
     return record
@@ -56,43 +154,51 @@ async def get_record(id: UUID, db: Session = Depends(get_db), user_id: UUID = De
 async def update_record(
     id: UUID,
     record: RecordUpdate,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: UUID = Depends(get_current_user),
 ):
-    db_record = db.query(Record).filter(Record.id == id, Record.user_id == user_id).first()
+    db_record = await get_user_record(db, id, user_id)
     if not db_record:
         raise HTTPException(status_code=404, detail="Record not found")
 
+    # Only re-embed when the embedded document (name + tags + notes) actually changed
+    needs_embedding = (
+        embedding_source_hash(compose_document(record.name, record.tags, record.notes)) != db_record.embedding_source_hash
+        or any(getattr(db_record, embedding_column_name(model)) is None for model in embedding_models())
+    )
     db_record.name = record.name
     db_record.notes = record.notes
 
-    # Update tags
-    db.query(RecordTag).filter(RecordTag.record_id == id).delete()
-    for tag_name in record.tags:
-        tag = db.query(Tag).filter(Tag.user_id == user_id, Tag.name == tag_name).first()
-        if not tag:
-            tag = Tag(user_id=user_id, name=tag_name)
-            db.add(tag)
-            db.commit()
-            db.refresh(tag)
-        db.add(RecordTag(record_id=db_record.id, tag_id=tag.id))
-
-    db.commit()
-    db.refresh(db_record)
+    # Update tags: diff the current links against the requested ones
+    tag_ids = set((await upsert_tags(db, user_id, record.tags)).values())
+    current_tag_ids = {tag.id for tag in db_record.tags}
+    removed_tag_ids = current_tag_ids - tag_ids
+    added_tag_ids = tag_ids - current_tag_ids
+    if removed_tag_ids:
+        await db.execute(
+            delete(RecordTag).where(RecordTag.record_id == id, RecordTag.tag_id.in_(removed_tag_ids))
+        )
+    if added_tag_ids:
+        await db.execute(
+            insert(RecordTag),
+            [{"record_id": id, "tag_id": tag_id} for tag_id in added_tag_ids],
+        )
 
-    # Launch async embedding task
-    background_tasks.add_task(compute_embedding, db_record.id, record.notes, db)
+    # Flush the record update before queueing, see enqueue_embedding_jobs
+    await db.flush()
+    if needs_embedding:
+        await enqueue_embedding_jobs(db, [id])
+    await db.commit()
 
-    return db_record
+    return await get_user_record(db, db_record.id, user_id)
 
 @router.delete("/{id}")
-async def delete_record(id: UUID, db: Session = Depends(get_db), user_id: UUID = Depends(get_current_user)):
-    record = db.query(Record).filter(Record.id == id, Record.user_id == user_id).first()
+async def delete_record(id: UUID, db: AsyncSession = Depends(get_db), user_id: UUID = Depends(get_current_user)):
+    record = await get_user_record(db, id, user_id)
     if not record:
         raise HTTPException(status_code=404, detail="Record not found")
-    db.delete(record)
-    db.commit()
+    await db.delete(record)
+    await db.commit()
     return {"message": "Record deleted"}
 
 # Example Request (POST /records):
@@ -1,60 +1,310 @@
 # routers/search.py (refactored)
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import asyncio
+import base64
+import re
+import logging
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import text
-from sqlalchemy import exists
-from pgvector.sqlalchemy import Vector
-from app.database import get_db
+from sqlalchemy import select, func, cast, literal, null, or_, tuple_, Float
+from pgvector.sqlalchemy import HALFVEC, BIT
+from app.database import get_db, SessionLocal, Vector
+from app.config import settings
 from app.models.record import Record
+from app.models.record_chunk import RecordChunk, EMBEDDING_DIMENSIONS
 from app.models.tag import Tag, RecordTag
-from app.schemas.search import SearchRequest, SearchResponse
-from app.services.embedding import get_embedding
+from app.schemas.search import (
+    SEARCH_MAX_OFFSET, SearchCursor, SearchRequest, SearchResponse, SuggestRecord, SuggestResponse,
+)
+from app.services.embedding import (
+    embedding_cache, embedding_column, generate_cache_key, get_embedding, warm_embedding,
+)
+from app.services.search_plan import apply_search_plan
+from app.services.tags import resolve_tag_prefixes
 from app.utils.security import get_current_user
-from uuid import UUID
-from typing import List
+from uuid import UUID, uuid4
+from typing import List, Optional, Set
 
 router = APIRouter(prefix="/search", tags=["search"])
+logger = logging.getLogger(__name__)
 
-@router.post("/", response_model=List[SearchResponse])
-async def search_records(
-    request: SearchRequest,
-    db: Session = Depends(get_db),
-    user_id: UUID = Depends(get_current_user),
+# Keep references so pending shadow searches and cache warm-ups aren't garbage collected
+_background_tasks: Set[asyncio.Task] = set()
+# /search/suggest cache warm-ups in flight, capped at search_suggest_max_warmups
+_warmup_tasks: Set[asyncio.Task] = set()
+
+NAME_LIKE = re.compile(r"^[^\W\d_]+(?:[\s.'-]+[^\W\d_]*){0,2}$")
+
+def tagged_records(tag_ids: List[UUID]):
+    """Record ids carrying any of the tags, via the (tag_id, record_id) index."""
+    return select(RecordTag.record_id).where(RecordTag.tag_id.in_(tag_ids))
+
+
+def nearest_chunks_query(
+    user_id: UUID, query_embedding, model: str, plan: str, candidates: int, tag_ids: Optional[List[UUID]] = None
 ):
-    query_embedding = await get_embedding(request.query)
-    if not query_embedding:
-        raise HTTPException(status_code=500, detail="Failed to compute query embedding")
+    """Select (record_id, cosine distance) of the user's nearest chunks for `model`.
 
-    query = (
-        db.query(
-            Record,
-            Record.all_mpnet_base_v2_embedding.cosine_distance(query_embedding).label("distance")
+    With tag_ids the chunks are restricted to tagged records before ordering by
+    distance, so the candidates aren't spent on records the filter drops.
+
+    With a quantized vector_search_index the HNSW pass runs on half-precision or
+    binary vectors and over-fetches; the shortlist is then re-ranked by the exact
+    cosine distance on the full vectors.
+    """
+    column = embedding_column(RecordChunk, model)
+    query_vector = literal(query_embedding, Vector(EMBEDDING_DIMENSIONS))
+    chunk_distance = column.cosine_distance(query_vector)
+    owned = [RecordChunk.user_id == user_id]
+    if tag_ids is not None:
+        owned.append(RecordChunk.record_id.in_(tagged_records(tag_ids)))
+    if plan == "exact" or settings.vector_search_index == "vector":
+        return (
+            select(RecordChunk.record_id, chunk_distance.label("distance"))
+            .where(*owned)
+            .order_by(chunk_distance)
+            .limit(candidates)
+        )
+
+    # Expressions must match the migration's expression indexes exactly
+    if settings.vector_search_index == "halfvec":
+        approximate_distance = cast(column, HALFVEC(EMBEDDING_DIMENSIONS)).cosine_distance(
+            cast(query_vector, HALFVEC(EMBEDDING_DIMENSIONS))
         )
-        .filter(Record.user_id == str(user_id))
-        .filter(Record.all_mpnet_base_v2_embedding.cosine_distance(query_embedding) <= 0.5)
+    else:
+        approximate_distance = cast(func.binary_quantize(column), BIT(EMBEDDING_DIMENSIONS)).hamming_distance(
+            func.binary_quantize(query_vector)
+        )
+    shortlist = (
+        select(RecordChunk.id)
+        .where(*owned)
+        .order_by(approximate_distance)
+        .limit(candidates * settings.quantized_rerank_factor)
+    )
+    return (
+        select(RecordChunk.record_id, chunk_distance.label("distance"))
+        .where(RecordChunk.id.in_(shortlist.scalar_subquery()))
+        .order_by(chunk_distance)
+        .limit(candidates)
     )
 
+
+def apply_filters(query, request: SearchRequest, tag_ids: Optional[List[UUID]] = None):
+    """Restrict a query over Record to the request's date range and resolved tag ids."""
     if request.start_date:
-        query = query.filter(Record.created_at >= request.start_date)
+        query = query.where(Record.created_at >= request.start_date)
 
     if request.end_date:
-        query = query.filter(Record.created_at <= request.end_date)
-
-    if request.tags:
-        # Use exists instead of join to avoid duplicate rows
-        tag_exists = exists().where(
-            RecordTag.record_id == Record.id
-        ).where(
-            RecordTag.tag_id == Tag.id
-        ).where(
-            Tag.name.ilike_any([f"{tag}%" for tag in request.tags])
+        query = query.where(Record.created_at <= request.end_date)
+
+    if tag_ids is not None:
+        # Semi-join instead of join to avoid duplicate rows
+        query = query.where(Record.id.in_(tagged_records(tag_ids)))
+    return query
+
+
+def candidate_count(request: SearchRequest, depth: int) -> int:
+    # Deeper pages need more candidates; records often have several chunks
+    return max(settings.search_chunk_candidates, 2 * (depth + request.limit))
+
+
+def record_distances_query(
+    user_id: UUID, query_embedding, model: str, plan: str, candidates: int, tag_ids: Optional[List[UUID]] = None
+):
+    """Subquery of (record_id, distance) over the nearest chunks."""
+    # Nearest chunks first (index-backed), then max-sim per record: a record is as
+    # close as its closest chunk
+    nearest_chunks = nearest_chunks_query(user_id, query_embedding, model, plan, candidates, tag_ids).subquery()
+    return (
+        select(nearest_chunks.c.record_id, func.min(nearest_chunks.c.distance).label("distance"))
+        .group_by(nearest_chunks.c.record_id)
+        .subquery()
+    )
+
+
+def lexical_match(query_text: str, names_only: bool = False):
+    """(predicate, rank) for matching records lexically; both are served by GIN indexes.
+
+    Names and notes match on trigram word similarity, so "John D" finds "John
+    Doe"; notes also match whole words through the full-text search_vector.
+    """
+    query_literal = literal(query_text)
+    name_match = query_literal.op("<%")(Record.name)
+    name_rank = func.word_similarity(query_literal, Record.name)
+    if names_only:
+        return name_match, name_rank
+    tsquery = func.websearch_to_tsquery("simple", query_text)
+    return (
+        or_(name_match, query_literal.op("<%")(Record.notes), Record.search_vector.op("@@")(tsquery)),
+        func.greatest(name_rank, func.word_similarity(query_literal, Record.notes), func.ts_rank(Record.search_vector, tsquery)),
+    )
+
+
+def is_name_like(query_text: str) -> bool:
+    """Short queries made of up to three words of letters, like "John D" or "Mary O'Neil"."""
+    return len(query_text) <= 40 and NAME_LIKE.match(query_text.strip()) is not None
+
+
+def build_search_query(
+    request: SearchRequest,
+    user_id: UUID,
+    query_embedding,
+    model: str,
+    plan: str,
+    cursor: Optional[SearchCursor] = None,
+    tag_ids: Optional[List[UUID]] = None,
+):
+    """Select one page of (Record, distance, score) rows for the request against `model`'s chunk vectors."""
+    depth = cursor.depth if cursor else request.offset
+    record_distances = record_distances_query(
+        user_id, query_embedding, model, plan, candidate_count(request, depth), tag_ids
+    )
+
+    query = (
+        select(Record, record_distances.c.distance, null().label("score"))
+        .join(record_distances, record_distances.c.record_id == Record.id)
+        .where(Record.user_id == user_id)
+        .where(record_distances.c.distance <= request.max_distance)
+    )
+    query = apply_filters(query, request, tag_ids)
+
+    # Keyset pagination on (distance, id); id breaks ties between equally close records
+    if cursor:
+        query = query.where(tuple_(record_distances.c.distance, Record.id) > tuple_(cursor.distance, cursor.id))
+    else:
+        query = query.offset(request.offset)
+    return query.order_by(record_distances.c.distance, Record.id).limit(request.limit)
+
+
+def build_hybrid_query(
+    request: SearchRequest,
+    user_id: UUID,
+    query_embedding,
+    model: str,
+    plan: str,
+    cursor: Optional[SearchCursor] = None,
+    tag_ids: Optional[List[UUID]] = None,
+):
+    """Select one page of (Record, distance, score) rows fusing vector and lexical ranks.
+
+    Each side ranks its own candidates; reciprocal-rank fusion scores a record
+    sum(1 / (k + rank)) over the sides it appears in, all in one statement.
+    Fused scores have no keyset, so pages continue by offset.
+    """
+    depth = cursor.depth if cursor else request.offset
+    candidates = candidate_count(request, depth)
+    record_distances = record_distances_query(user_id, query_embedding, model, plan, candidates, tag_ids)
+    semantic = (
+        select(
+            record_distances.c.record_id,
+            record_distances.c.distance,
+            func.row_number().over(order_by=record_distances.c.distance).label("rank"),
         )
-        query = query.filter(tag_exists)
+        .where(record_distances.c.distance <= request.max_distance)
+        .subquery()
+    )
+    match, rank = lexical_match(request.query)
+    lexical = (
+        apply_filters(select(
+            Record.id.label("record_id"),
+            func.row_number().over(order_by=(rank.desc(), Record.id)).label("rank"),
+        ), request, tag_ids)
+        .where(Record.user_id == user_id, match)
+        .order_by(rank.desc(), Record.id)
+        .limit(candidates)
+        .subquery()
+    )
+    score = cast(
+        func.coalesce(1.0 / (settings.search_rrf_k + semantic.c.rank), 0.0)
+        + func.coalesce(1.0 / (settings.search_rrf_k + lexical.c.rank), 0.0),
+        Float,
+    )
+    fused = (
+        select(
+            func.coalesce(semantic.c.record_id, lexical.c.record_id).label("record_id"),
+            semantic.c.distance,
+            score.label("score"),
+        )
+        .select_from(semantic.join(lexical, semantic.c.record_id == lexical.c.record_id, full=True))
+        .subquery()
+    )
+
+    query = (
+        select(Record, fused.c.distance, fused.c.score)
+        .join(fused, fused.c.record_id == Record.id)
+        .where(Record.user_id == user_id)
+    )
+    query = apply_filters(query, request, tag_ids)
+    return query.order_by(fused.c.score.desc(), Record.id).offset(depth).limit(request.limit)
+
+
+def build_lexical_query(
+    request: SearchRequest,
+    user_id: UUID,
+    cursor: Optional[SearchCursor] = None,
+    tag_ids: Optional[List[UUID]] = None,
+):
+    """Select one page of (Record, distance, score) rows matching the query against names only."""
+    match, rank = lexical_match(request.query, names_only=True)
+    query = (
+        select(Record, null().label("distance"), rank.label("score"))
+        .where(Record.user_id == user_id, match)
+    )
+    query = apply_filters(query, request, tag_ids)
+    depth = cursor.depth if cursor else request.offset
+    return query.order_by(rank.desc(), Record.id).offset(depth).limit(request.limit)
+
+
+def encode_cursor(cursor: SearchCursor) -> str:
+    return base64.urlsafe_b64encode(cursor.model_dump_json().encode()).decode()
+
+
+def decode_cursor(value: str) -> SearchCursor:
+    try:
+        return SearchCursor.model_validate_json(base64.urlsafe_b64decode(value.encode()))
+    except (ValueError, ValidationError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    query = query.order_by("distance").limit(3)
 
-    result = query.all()
-    records = [
+# Modes that rank by vector distance, by what builds their query
+VECTOR_QUERY_BUILDERS = {"semantic": build_search_query, "hybrid": build_hybrid_query}
+
+
+async def shadow_search(
+    request: SearchRequest,
+    user_id: UUID,
+    mode: str,
+    tag_ids: Optional[List[UUID]],
+    primary_ids: List[UUID],
+    primary_seconds: float,
+):
+    """Run the search against the shadow model and log how it compares to the primary results."""
+    model = settings.embedding_shadow_model
+    try:
+        started = time.perf_counter()
+        query_embedding = await get_embedding(request.query, model)
+        if query_embedding is None or not len(query_embedding):
+            return
+        async with SessionLocal() as db:
+            plan = await apply_search_plan(db, user_id, request.ef_search)
+            query = VECTOR_QUERY_BUILDERS[mode](request, user_id, query_embedding, model, plan, tag_ids=tag_ids)
+            result = (await db.execute(query)).unique().all()
+        shadow_seconds = time.perf_counter() - started
+        shadow_ids = [r.Record.id for r in result]
+        overlap = len(set(primary_ids) & set(shadow_ids))
+        logger.info(
+            f"Shadow {mode} search {model}: overlap {overlap}/{max(len(primary_ids), len(shadow_ids))}, "
+            f"same order {primary_ids == shadow_ids}, "
+            f"latency {primary_seconds * 1000:.1f}ms primary vs {shadow_seconds * 1000:.1f}ms shadow"
+        )
+    except Exception as e:
+        logger.error(f"Shadow search with {model} failed: {str(e)}")
+
+
+def to_response(rows) -> List[SearchResponse]:
+    return [
         SearchResponse(
             id=r.Record.id,
             name=r.Record.name,
@@ -62,20 +312,152 @@ async def search_records(
             tags=[tag.name for tag in r.Record.tags],
             created_at=r.Record.created_at,
             updated_at=r.Record.updated_at,
-            distance=r.distance
+            distance=r.distance,
+            score=r.score
         )
-        for r in result
+        for r in rows
     ]
+
+
+@router.post("/", response_model=List[SearchResponse])
+async def search_records(
+    request: SearchRequest,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    user_id: UUID = Depends(get_current_user),
+):
+    """One page of the best matching records; X-Next-Cursor is set when there may be more."""
+    started = time.perf_counter()
+    query_hash = generate_cache_key(request.query)
+    cursor = decode_cursor(request.cursor) if request.cursor else None
+    if cursor and cursor.query_hash != query_hash:
+        raise HTTPException(status_code=400, detail="Cursor belongs to a different query")
+    # A cursor keeps paging in the mode its first page was served with
+    mode = cursor.mode if cursor else request.mode or settings.search_mode
+    session = cursor.session if cursor else uuid4().hex
+    session_key = f"cursor:{session}"
+    depth = cursor.depth if cursor else request.offset
+
+    # Resolve tag prefixes to ids once; the queries then filter through the record_tags index
+    tag_ids = await resolve_tag_prefixes(db, user_id, request.tags) if request.tags else None
+    if tag_ids == []:
+        return []
+
+    # Lexical fast path: name lookups are answered from the trigram index without an
+    # embedding round trip; hybrid search takes over unless the best name match is
+    # close enough that the query was clearly a name ("John Doe", not "machine learning")
+    records = None
+    if mode == "lexical" or (
+        mode == "hybrid" and not cursor and settings.search_lexical_fast_path and is_name_like(request.query)
+    ):
+        result = (await db.execute(build_lexical_query(request, user_id, cursor, tag_ids))).unique().all()
+        if mode == "lexical" or (result and result[0].score >= settings.search_lexical_fast_path_min_similarity):
+            mode = "lexical"
+            records = to_response(result)
+
+    if records is None:
+        # Later pages reuse the vector pinned under the cursor session
+        query_embedding = embedding_cache.get(session_key) if cursor else None
+        if query_embedding is None:
+            query_embedding = await get_embedding(request.query)
+        if query_embedding is None or not len(query_embedding):
+            raise HTTPException(status_code=500, detail="Failed to compute query embedding")
+
+        plan = await apply_search_plan(db, user_id, request.ef_search)
+        query = VECTOR_QUERY_BUILDERS[mode](
+            request, user_id, query_embedding, settings.embedding_model, plan, cursor, tag_ids
+        )
+        records = to_response((await db.execute(query)).unique().all())
+        logger.debug(f"{mode} search for user {user_id} used the {plan} plan and returned {len(records)} records")
+        if len(records) == request.limit:
+            embedding_cache.set(session_key, query_embedding)
+
+    # Paging stops where offset paging would, so cursors stay within SearchCursor's bounds
+    if len(records) == request.limit and depth + len(records) <= SEARCH_MAX_OFFSET:
+        response.headers["X-Next-Cursor"] = encode_cursor(SearchCursor(
+            session=session,
+            query_hash=query_hash,
+            mode=mode,
+            distance=records[-1].distance,
+            id=records[-1].id,
+            depth=depth + len(records),
+        ))
+
+    # Compare first pages against the shadow model off the request path; results are never served
+    if settings.embedding_shadow_read and settings.embedding_shadow_model and not cursor and mode != "lexical":
+        task = asyncio.create_task(
+            shadow_search(request, user_id, mode, tag_ids, [r.id for r in records], time.perf_counter() - started)
+        )
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
     return records
 
+async def warm_query_embedding(query_text: str):
+    try:
+        await warm_embedding(query_text)
+    except Exception as e:
+        logger.warning(f"Warming the embedding cache failed: {str(e)}")
+
+
+@router.get("/suggest", response_model=SuggestResponse)
+async def suggest(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(5, ge=1, le=20),
+    db: AsyncSession = Depends(get_db),
+    user_id: UUID = Depends(get_current_user),
+):
+    """Typeahead: record names and tags matching the text so far, straight from the indexes.
+
+    Also embeds the text in the background, so submitting it as a search finds
+    the query vector already cached. Warm-ups are dropped while
+    search_suggest_max_warmups of them are still running.
+    """
+    if (
+        len(q.strip()) >= settings.search_suggest_warm_min_length
+        and len(_warmup_tasks) < settings.search_suggest_max_warmups
+    ):
+        task = asyncio.create_task(warm_query_embedding(q))
+        _warmup_tasks.add(task)
+        task.add_done_callback(_warmup_tasks.discard)
+
+    match, rank = lexical_match(q, names_only=True)
+    records = (await db.execute(
+        select(Record.id, Record.name)
+        .where(Record.user_id == user_id, or_(Record.name.istartswith(q, autoescape=True), match))
+        .order_by(rank.desc(), Record.name)
+        .limit(limit)
+    )).all()
+    tags = (await db.execute(
+        select(Tag.name)
+        .where(Tag.user_id == user_id, Tag.normalized_name.startswith(q.lower(), autoescape=True))
+        .order_by(Tag.normalized_name)
+        .limit(limit)
+    )).scalars().all()
+    return SuggestResponse(
+        records=[SuggestRecord(id=record.id, name=record.name) for record in records],
+        tags=list(tags),
+    )
+
+# Example Request (GET /search/suggest?q=John%20D):
+# Example Response:
+# {
+#   "records": [{"id": "123e4567-e89b-12d3-a456-426614174000", "name": "John Doe"}],
+#   "tags": []
+# }
+#
 # Example Request (POST /search):
 # {
 #   "query": "AI conference",
 #   "start_date": "2025-01-01T00:00:00Z",
 #   "end_date": "2025-12-31T23:59:59Z",
-#   "tags": ["conference", "AI"]
+#   "tags": ["conference", "AI"],
+#   "mode": "hybrid",
+#   "limit": 10,
+#   "max_distance": 0.5
 # }
 #
+# Next page: repeat the request with "cursor" set to the X-Next-Cursor response header
+#
 # Example Response:
 # [
 #   {
@@ -84,6 +466,7 @@ async def search_records(
 #     "notes": "Met at conference, works in AI",
 #     "created_at": "2025-09-25T14:17:00Z",
 #     "updated_at": "2025-09-25T14:17:00Z",
-#     "distance": 0.123
+#     "distance": 0.123,
+#     "score": 0.0325
 #   }
 # ]
\ No newline at end of file
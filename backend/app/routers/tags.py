@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from typing import List
 
@@ -11,6 +12,6 @@ from app.schemas.tag import TagResponse
 router = APIRouter(prefix="/tags", tags=["tags"])
 
 @router.get("/", response_model=List[TagResponse])
-async def get_tags(db: Session = Depends(get_db), user_id: UUID = Depends(get_current_user)):
-    tags = db.query(Tag).filter(Tag.user_id == user_id).all()
-    return tags
\ No newline at end of file
+async def get_tags(db: AsyncSession = Depends(get_db), user_id: UUID = Depends(get_current_user)):
+    result = await db.scalars(select(Tag).where(Tag.user_id == user_id))
+    return result.all()
\ No newline at end of file
@@ -13,6 +13,13 @@ class RecordUpdate(BaseModel):
     notes: Optional[str] = None
     tags: List[str] = []
 
+class RecordBulkCreate(BaseModel):
+    records: List[RecordCreate]
+
+class RecordBulkResponse(BaseModel):
+    created: int
+    ids: List[UUID]
+
 class RecordResponse(BaseModel):
     id: UUID
     user_id: UUID
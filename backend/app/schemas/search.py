@@ -1,13 +1,35 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from uuid import UUID
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
+
+SEARCH_MAX_LIMIT = 50
+SEARCH_MAX_OFFSET = 1000
 
 class SearchRequest(BaseModel):
     query: str
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
     tags: List[str] = []
+    limit: int = Field(3, ge=1, le=SEARCH_MAX_LIMIT)
+    offset: int = Field(0, ge=0, le=SEARCH_MAX_OFFSET)
+    # X-Next-Cursor of the previous page; takes precedence over offset
+    cursor: Optional[str] = None
+    max_distance: float = Field(0.5, ge=0.0, le=2.0)
+    # "semantic", "hybrid" (vector + lexical, rank-fused) or "lexical" (names only);
+    # defaults to settings.search_mode
+    mode: Optional[Literal["semantic", "hybrid", "lexical"]] = None
+    # Overrides hnsw_ef_search for this request: higher is slower but finds more filtered hits
+    ef_search: Optional[int] = Field(None, ge=1, le=1000)
+
+class SearchCursor(BaseModel):
+    """Keyset position after the last returned record, encoded into the opaque cursor string."""
+    session: str  # identifies the cached query embedding
+    query_hash: str
+    mode: Literal["semantic", "hybrid", "lexical"]
+    distance: Optional[float]  # keyset for semantic pages; other modes page by depth
+    id: UUID
+    depth: int = Field(ge=0, le=SEARCH_MAX_OFFSET + SEARCH_MAX_LIMIT)  # records returned so far
 
 class SearchResponse(BaseModel):
     id: UUID
@@ -16,7 +38,18 @@ class SearchResponse(BaseModel):
     tags: List[str]
     created_at: datetime
     updated_at: datetime
-    distance: float
+    # Cosine distance when the record came from the vector search
+    distance: Optional[float] = None
+    # Reciprocal-rank fusion score (hybrid) or name similarity (lexical)
+    score: Optional[float] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class SuggestRecord(BaseModel):
+    id: UUID
+    name: str
+
+class SuggestResponse(BaseModel):
+    records: List[SuggestRecord]
+    tags: List[str]
@@ -0,0 +1,86 @@
+import numpy as np
+from app.config import settings
+from app.services.embedding import request_embeddings_batch
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+
+def compose_header(name: str, tags: Iterable[str]) -> str:
+    """Name and tags, repeated at the top of every chunk so they stay searchable."""
+    tags = sorted(set(tags))
+    return f"{name}\nTags: {', '.join(tags)}" if tags else name
+
+
+def compose_document(name: str, tags: Iterable[str], notes: Optional[str]) -> str:
+    """The full text a record is embedded from; its hash is the record's embedding_source_hash."""
+    header = compose_header(name, tags)
+    return f"{header}\n{notes}" if notes else header
+
+
+def split_text(text: str, size: int, overlap: int) -> List[str]:
+    """Split text into windows of at most `size` characters overlapping by about `overlap`,
+    cutting at whitespace where possible."""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            # Back off to the last whitespace so words aren't cut in half
+            cut = text.rfind(" ", start + overlap + 1, end)
+            if cut == -1:
+                cut = text.rfind("\n", start + overlap + 1, end)
+            if cut != -1:
+                end = cut
+        chunks.append(text[start:end].strip())
+        if end == len(text):
+            break
+        # Start the next window at a word boundary inside the overlap, too
+        next_start = end - overlap
+        boundary = text.find(" ", next_start, end)
+        if boundary == -1:
+            boundary = text.find("\n", next_start, end)
+        if boundary != -1:
+            next_start = boundary + 1
+        start = max(next_start, start + 1)
+    return [chunk for chunk in chunks if chunk]
+
+
+def build_chunks(name: str, tags: Iterable[str], notes: Optional[str]) -> List[str]:
+    """Texts to embed for a record: the whole document if it fits in one chunk, otherwise
+    overlapping windows of the notes, each prefixed with the name/tags header.
+
+    Always returns at least one chunk: when the header leaves no room for the
+    notes (or there are none), the whole document is windowed instead.
+    """
+    tags = list(tags)
+    document = compose_document(name, tags, notes)
+    if len(document) <= settings.embedding_chunk_size:
+        return [document]
+    header = compose_header(name, tags)
+    body_size = settings.embedding_chunk_size - len(header) - 1
+    chunks = []
+    if notes and body_size > 2 * settings.embedding_chunk_overlap:
+        chunks = [f"{header}\n{chunk}" for chunk in split_text(notes, body_size, settings.embedding_chunk_overlap)]
+    return chunks or split_text(document, settings.embedding_chunk_size, settings.embedding_chunk_overlap)
+
+
+async def embed_chunks(documents: Dict[UUID, List[str]], model: Optional[str] = None) -> Dict[UUID, List[np.ndarray]]:
+    """Embed every chunk of the given records in as few /embed/batch calls as possible.
+
+    Records missing any chunk vector in the response are left out of the result.
+    """
+    items = [
+        (f"{record_id}:{index}", chunk)
+        for record_id, chunks in documents.items()
+        for index, chunk in enumerate(chunks)
+    ]
+    vectors = {}
+    for start in range(0, len(items), settings.embedding_batch_size):
+        vectors.update(await request_embeddings_batch(items[start:start + settings.embedding_batch_size], model))
+
+    embedded = {}
+    for record_id, chunks in documents.items():
+        keys = [f"{record_id}:{index}" for index in range(len(chunks))]
+        if all(key in vectors for key in keys):
+            embedded[record_id] = [vectors[key] for key in keys]
+    return embedded
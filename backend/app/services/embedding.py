@@ -1,78 +1,328 @@
+import asyncio
+import base64
 import httpx
 import logging
-from typing import List, Optional
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 import hashlib
 from threading import Lock
+import numpy as np
 from pydantic_settings import BaseSettings
 from tenacity import retry, stop_after_attempt, wait_exponential
 from sqlalchemy.orm import Session
 from fastapi import Depends
 from app.config import settings
+from app.services.embedding_store import create_embedding_store
 
 logger = logging.getLogger(__name__)
 
-# Thread-safe in-memory cache
+# Thread-safe in-memory LRU cache, bounded by entry count, byte size and optional TTL
 class EmbeddingCache:
-    def __init__(self):
-        self.cache = {}
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: Optional[float] = None):
+        self.cache: "OrderedDict[str, Tuple[np.ndarray, Optional[float]]]" = OrderedDict()
         self.lock = Lock()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
 
-    def get(self, key: str) -> Optional[List[float]]:
+    @staticmethod
+    def _entry_size(key: str, value: np.ndarray) -> int:
+        return value.nbytes + len(key)
+
+    def _pop(self, key: str) -> None:
+        value, _ = self.cache.pop(key)
+        self.current_bytes -= self._entry_size(key, value)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
         with self.lock:
-            return self.cache.get(key)
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._pop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return value
 
-    def set(self, key: str, value: List[float]) -> None:
+    def set(self, key: str, value: Sequence[float]) -> None:
+        # Compact float32 storage: 3 KB per 768-d vector instead of ~25 KB of Python floats
+        vector = np.asarray(value, dtype=np.float32)
+        vector.setflags(write=False)
+        size = self._entry_size(key, vector)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
         with self.lock:
-            self.cache[key] = value
+            if key in self.cache:
+                self._pop(key)
+            self.cache[key] = (vector, expires_at)
+            self.current_bytes += size
+            while len(self.cache) > self.max_entries or self.current_bytes > self.max_bytes:
+                oldest_key = next(iter(self.cache))
+                self._pop(oldest_key)
+                self.evictions += 1
 
     def clear(self) -> None:
         with self.lock:
             self.cache.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "entries": len(self.cache),
+                "bytes": self.current_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
 
 
 # Global cache instance
-embedding_cache = EmbeddingCache()
+embedding_cache = EmbeddingCache(
+    max_entries=settings.embedding_cache_max_entries,
+    max_bytes=settings.embedding_cache_max_bytes,
+    ttl_seconds=settings.embedding_cache_ttl_seconds,
+)
+embedding_store = create_embedding_store(settings.embedding_store)
+
+# Application-lifetime client, opened/closed by the FastAPI lifespan hook
+_http_client: Optional[httpx.AsyncClient] = None
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build a pooled keep-alive client for the embedding service."""
+    return httpx.AsyncClient(
+        http2=settings.embedding_http2,
+        limits=httpx.Limits(
+            max_connections=settings.embedding_max_connections,
+            max_keepalive_connections=settings.embedding_max_keepalive_connections,
+            keepalive_expiry=settings.embedding_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(settings.embedding_timeout, connect=settings.embedding_connect_timeout),
+    )
+
+async def init_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = create_http_client()
+    return _http_client
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily outside the app lifespan."""
+    global _http_client
+    if _http_client is None:
+        _http_client = create_http_client()
+    return _http_client
 
 def generate_cache_key(text: str) -> str:
     """Generate a deterministic cache key from input text."""
     return hashlib.md5(text.encode('utf-8')).hexdigest()
 
 
+def embedding_column_name(model: str) -> str:
+    """Each model gets its own vector column, e.g. all-mpnet-base-v2 -> all_mpnet_base_v2_embedding."""
+    return f"{model.replace('-', '_')}_embedding"
+
+
+def embedding_column(entity: Any, model: str) -> Any:
+    """The ORM vector column for a model on Record or RecordChunk."""
+    return getattr(entity, embedding_column_name(model))
+
+
+def embedding_models() -> List[str]:
+    """Models every record is embedded with: the primary one, plus the shadow model during a switch."""
+    if settings.embedding_shadow_model and settings.embedding_shadow_model != settings.embedding_model:
+        return [settings.embedding_model, settings.embedding_shadow_model]
+    return [settings.embedding_model]
+
+
+def embedding_source_hash(text: Optional[str]) -> Optional[str]:
+    """Hash of the text a record embedding is computed from; matches encode(sha256(...), 'hex') in SQL."""
+    if not text:
+        return None
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def decode_embedding(value: Any, encoding_format: str) -> np.ndarray:
+    """Decode an embedding-service vector straight into a float32 array."""
+    if encoding_format == "base64":
+        value = base64.b64decode(value)
+    if isinstance(value, (bytes, bytearray)):
+        return np.frombuffer(value, dtype="<f4")
+    return np.asarray(value, dtype=np.float32)
+
+
+@retry(stop=stop_after_attempt(settings.max_embedding_retries),
+       wait=wait_exponential(multiplier=settings.embedding_retry_delay, min=1, max=10))
+async def request_embedding(text: str, model: Optional[str] = None) -> np.ndarray:
+    """Call the embedding service for a single text, bypassing every cache."""
+    model = model or settings.embedding_model
+    client = get_http_client()
+    try:
+        response = await client.post(
+            settings.embedding_service_url_for(model),
+            headers={
+                "Authorization": f"Bearer {settings.embedding_service_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "input": text,
+                "model": model,
+                "encoding_format": settings.embedding_encoding_format
+            },
+        )
+        response.raise_for_status()
+        if settings.embedding_encoding_format == "binary":
+            return decode_embedding(response.content, "binary")
+        embedding = response.json().get("data", [{}])[0].get("embedding")
+        return decode_embedding(embedding, settings.embedding_encoding_format)
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Embedding service error: {e}")
+        raise
+    except httpx.RequestError as e:
+        logger.error(f"Embedding service error: {e}")
+        raise
+
+
 @retry(stop=stop_after_attempt(settings.max_embedding_retries),
        wait=wait_exponential(multiplier=settings.embedding_retry_delay, min=1, max=10))
-async def get_embedding(text: str) -> List[float]:
+async def request_embeddings_batch(items: Sequence[Tuple[str, str]], model: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Embed (id, text) pairs with one /embed/batch call, bypassing every cache."""
+    model = model or settings.embedding_model
+    # "binary" is only served by /embed; the batch endpoint gets base64 instead
+    encoding_format = "float" if settings.embedding_encoding_format == "float" else "base64"
+    client = get_http_client()
+    try:
+        response = await client.post(
+            f"{settings.embedding_service_url_for(model)}/batch",
+            headers={
+                "Authorization": f"Bearer {settings.embedding_service_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "inputs": [{"id": item_id, "text": text} for item_id, text in items],
+                "model": model,
+                "encoding_format": encoding_format
+            },
+            timeout=settings.embedding_batch_timeout,
+        )
+        response.raise_for_status()
+        return {
+            item["id"]: decode_embedding(item["embedding"], encoding_format)
+            for item in response.json().get("data", [])
+        }
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Embedding service batch error: {e}")
+        raise
+    except httpx.RequestError as e:
+        logger.error(f"Embedding service batch error: {e}")
+        raise
+
+
+async def _load_embedding(text: str, model: str, cache_key: str) -> np.ndarray:
+    text_hash = generate_cache_key(text)
+    # Shared store first, so other workers and restarts reuse earlier embeddings
+    try:
+        stored_embedding = await embedding_store.get(model, text_hash)
+    except Exception as e:
+        logger.warning(f"Embedding store lookup failed: {e}")
+        stored_embedding = None
+    if stored_embedding is not None:
+        embedding_cache.set(cache_key, stored_embedding)
+        return np.asarray(stored_embedding, dtype=np.float32)
+
+    embedding = await request_embedding(text, model)
+
+    # Store in cache
+    embedding_cache.set(cache_key, embedding)
+    try:
+        await embedding_store.set(model, text_hash, embedding)
+    except Exception as e:
+        logger.warning(f"Embedding store write failed: {e}")
+    logger.info(f"Generated and cached embedding for text: {text[:50]}...")
+    return embedding
+
+
+# Single-flight: concurrent misses for the same text share one in-flight load
+_inflight: Dict[str, "asyncio.Task[np.ndarray]"] = {}
+
+def _end_flight(cache_key: str, task: "asyncio.Task[np.ndarray]") -> None:
+    _inflight.pop(cache_key, None)
+    # Mark the exception as retrieved in case every waiter was cancelled
+    if not task.cancelled():
+        task.exception()
+
+
+async def get_embedding(text: str, model: Optional[str] = None) -> np.ndarray:
+    model = model or settings.embedding_model
+    # Primary-model keys stay plain text hashes; other models are namespaced
     cache_key = generate_cache_key(text)
+    if model != settings.embedding_model:
+        cache_key = f"{model}:{cache_key}"
 
     # Check cache first
     cached_embedding = embedding_cache.get(cache_key)
     if cached_embedding is not None:
         return cached_embedding
-    # Call embedding service
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                settings.embedding_service_url,
-                headers={
-                    "Authorization": f"Bearer {settings.embedding_service_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "input": text,
-                    "model": settings.embedding_model,
-                    "encoding_format": "float"
-                },
-                timeout=10.0
-            )
-            response.raise_for_status()
-            embedding = response.json().get("data", [{}])[0].get("embedding")
-
-            # Store in cache
-            embedding_cache.set(cache_key, embedding)
-            logger.info(f"Generated and cached embedding for text: {text[:50]}...")
-            return embedding
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Embedding service error: {e}")
-            raise
-        except httpx.RequestError as e:
-            logger.error(f"Embedding service error: {e}")
-            raise
+
+    task = _inflight.get(cache_key)
+    if task is None:
+        task = asyncio.create_task(_load_embedding(text, model, cache_key))
+        _inflight[cache_key] = task
+        task.add_done_callback(lambda t: _end_flight(cache_key, t))
+    # shield() keeps one caller's cancellation from failing the others
+    return await asyncio.shield(task)
+
+
+# Warm-up loads, kept apart from _inflight so a search never waits on a load without retries
+_warming: Dict[str, "asyncio.Task[np.ndarray]"] = {}
+
+def _end_warming(cache_key: str, task: "asyncio.Task[np.ndarray]") -> None:
+    _warming.pop(cache_key, None)
+    if not task.cancelled():
+        task.exception()
+
+
+async def _request_into_cache(text: str, cache_key: str) -> np.ndarray:
+    # One attempt: a failed warm-up only means the search embeds the text itself
+    embedding = await request_embedding.retry_with(stop=stop_after_attempt(1))(text)
+    embedding_cache.set(cache_key, embedding)
+    return embedding
+
+
+async def warm_embedding(text: str) -> None:
+    """Embed `text` with the primary model into the in-process cache only.
+
+    Skips the shared store in both directions and does not retry; a load
+    already in flight for the same text is joined rather than repeated.
+    """
+    cache_key = generate_cache_key(text)
+    if embedding_cache.get(cache_key) is not None:
+        return
+    task = _inflight.get(cache_key) or _warming.get(cache_key)
+    if task is None:
+        task = asyncio.create_task(_request_into_cache(text, cache_key))
+        _warming[cache_key] = task
+        task.add_done_callback(lambda t: _end_warming(cache_key, t))
+    await asyncio.shield(task)
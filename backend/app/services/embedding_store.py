@@ -0,0 +1,49 @@
+import logging
+from typing import Optional, Sequence
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from app.database import SessionLocal
+from app.models.query_embedding import QueryEmbedding
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingStore:
+    """Second-level embedding cache shared across workers and restarts. The base class stores nothing."""
+
+    async def get(self, model: str, text_hash: str) -> Optional[np.ndarray]:
+        return None
+
+    async def set(self, model: str, text_hash: str, embedding: Sequence[float]) -> None:
+        return None
+
+
+class PostgresEmbeddingStore(EmbeddingStore):
+    """Stores query embeddings in the `query_embeddings` table, keyed by model name + text hash."""
+
+    async def get(self, model: str, text_hash: str) -> Optional[np.ndarray]:
+        async with SessionLocal() as db:
+            return await db.scalar(
+                select(QueryEmbedding.embedding).where(
+                    QueryEmbedding.model == model,
+                    QueryEmbedding.text_hash == text_hash,
+                )
+            )
+
+    async def set(self, model: str, text_hash: str, embedding: Sequence[float]) -> None:
+        async with SessionLocal() as db:
+            await db.execute(
+                insert(QueryEmbedding)
+                .values(model=model, text_hash=text_hash, embedding=np.asarray(embedding, dtype=np.float32))
+                .on_conflict_do_nothing(index_elements=["model", "text_hash"])
+            )
+            await db.commit()
+
+
+def create_embedding_store(backend: str) -> EmbeddingStore:
+    if backend == "postgres":
+        return PostgresEmbeddingStore()
+    if backend == "none":
+        return EmbeddingStore()
+    raise ValueError(f"Unknown embedding store backend: {backend}")
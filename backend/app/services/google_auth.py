@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Dict, Optional
+import httpx
+from google.auth import jwt as google_jwt
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+MAX_AGE = re.compile(r"max-age=(\d+)")
+
+# Application-lifetime client for Google's token and certificate endpoints
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=settings.google_max_connections),
+        timeout=httpx.Timeout(settings.google_timeout),
+    )
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = create_http_client()
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily outside the app lifespan."""
+    global _http_client
+    if _http_client is None:
+        _http_client = create_http_client()
+    return _http_client
+
+
+class CertificateCache:
+    """Google's signing certificates, kept for as long as their Cache-Control max-age allows."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._certs: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self, force_refresh: bool = False) -> Dict[str, str]:
+        if not force_refresh and self._certs and self._expires_at > time.monotonic():
+            return self._certs
+        # One fetch per expiry; concurrent logins wait for it instead of piling on
+        async with self._lock:
+            if not force_refresh and self._certs and self._expires_at > time.monotonic():
+                return self._certs
+            response = await get_http_client().get(self.url)
+            response.raise_for_status()
+            self._certs = response.json()
+            match = MAX_AGE.search(response.headers.get("cache-control", ""))
+            max_age = int(match.group(1)) if match else settings.google_certs_default_max_age
+            self._expires_at = time.monotonic() + max_age
+            logger.info(f"Fetched {len(self._certs)} Google signing certificates, cached for {max_age}s")
+            return self._certs
+
+
+google_certs = CertificateCache(settings.google_certs_url)
+
+
+def _decode_id_token(token: str, certs: Dict[str, str]) -> Dict[str, Any]:
+    claims = google_jwt.decode(token, certs=certs, audience=settings.google_client_id, clock_skew_in_seconds=30)
+    if claims.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError(f"Wrong issuer: {claims.get('iss')}")
+    return claims
+
+
+async def verify_id_token(token: str) -> Dict[str, Any]:
+    """Verify a Google ID token against the cached certificates; raises ValueError if invalid.
+
+    Signature checks are CPU-bound, so they run in a thread off the event loop.
+    """
+    key_id = google_jwt.decode_header(token).get("kid")
+    certs = await google_certs.get()
+    if key_id is not None and key_id not in certs:
+        # Signed with a key Google rotated in before our copy expired; refetch once
+        certs = await google_certs.get(force_refresh=True)
+    return await asyncio.to_thread(_decode_id_token, token, certs)
@@ -0,0 +1,123 @@
+import codecs
+import csv
+import json
+import tempfile
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.tags import upsert_tags
+from app.tasks.embeddings import enqueue_embedding_jobs
+from app.schemas.record import RecordCreate
+from typing import IO, Any, AsyncIterator, Dict, List, Sequence, Tuple
+from uuid import UUID, uuid4
+
+
+async def insert_records(
+    db: AsyncSession,
+    user_id: UUID,
+    records: Sequence[RecordCreate],
+) -> List[UUID]:
+    """Insert a chunk of records and their tags in one transaction.
+
+    Tags are upserted set-based, records and record_tags are written with COPY
+    and every record is queued for embedding. Returns the new record ids.
+    """
+    # Runs first so the COPYs below share its transaction
+    tag_ids = await upsert_tags(db, user_id, (tag for record in records for tag in record.tags))
+
+    record_rows = []
+    record_tag_rows = []
+    for record in records:
+        record_id = uuid4()
+        record_rows.append((record_id, user_id, record.name, record.notes))
+        record_tag_rows.extend((record_id, tag_ids[tag]) for tag in dict.fromkeys(record.tags))
+
+    connection = await db.connection()
+    driver_connection = (await connection.get_raw_connection()).driver_connection
+    await driver_connection.copy_records_to_table(
+        "records", records=record_rows, columns=["id", "user_id", "name", "notes"]
+    )
+    if record_tag_rows:
+        await driver_connection.copy_records_to_table(
+            "record_tags", records=record_tag_rows, columns=["record_id", "tag_id"]
+        )
+    await enqueue_embedding_jobs(db, (record_id for record_id, _, _, _ in record_rows))
+    await db.commit()
+    return [record_id for record_id, _, _, _ in record_rows]
+
+
+class UploadTooLargeError(Exception):
+    pass
+
+
+async def spool_stream(stream: AsyncIterator[bytes], max_memory: int, max_size: int) -> IO[bytes]:
+    """Copy a streamed body into a temporary file (in memory up to `max_memory` bytes), rewound.
+
+    Raises UploadTooLargeError as soon as more than `max_size` bytes arrive.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    size = 0
+    async for chunk in stream:
+        size += len(chunk)
+        if size > max_size:
+            spool.close()
+            raise UploadTooLargeError(f"Upload exceeds {max_size} bytes")
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+async def iter_file(file: IO[bytes], chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    while chunk := file.read(chunk_size):
+        yield chunk
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a streamed UTF-8 body into lines without buffering the whole upload."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in stream:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_ndjson_rows(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (line number, parsed object) for each non-empty NDJSON line."""
+    line_number = 0
+    async for line in iter_lines(stream):
+        line_number += 1
+        if line.strip():
+            yield line_number, json.loads(line)
+
+
+async def iter_csv_rows(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (line number, row) for a CSV upload with a `name,notes,tags` header.
+
+    Tags are `;`-separated. Quoted fields may span several lines.
+    """
+    header = None
+    pending = None
+    line_number = 0
+    async for line in iter_lines(stream):
+        line_number += 1
+        pending = line if pending is None else f"{pending}\n{line}"
+        # An odd number of quotes means a quoted field continues on the next line
+        if pending.count('"') % 2:
+            continue
+        fields = next(csv.reader([pending]), [])
+        pending = None
+        if not any(fields):
+            continue
+        if header is None:
+            header = [field.strip().lower() for field in fields]
+            continue
+        row = dict(zip(header, fields))
+        tags = row.get("tags") or ""
+        yield line_number, {
+            "name": row.get("name"),
+            "notes": row.get("notes") or None,
+            "tags": [tag.strip() for tag in tags.split(";") if tag.strip()],
+        }
@@ -0,0 +1,65 @@
+import logging
+import time
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+from sqlalchemy import select, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.record_chunk import RecordChunk
+
+logger = logging.getLogger(__name__)
+
+# user_id -> (expires at, chunk count); only steers the plan, so a stale count is fine
+_chunk_counts: Dict[UUID, Tuple[float, int]] = {}
+_MAX_CACHED_USERS = 100_000
+
+
+async def user_chunk_count(db: AsyncSession, user_id: UUID) -> int:
+    """Number of record chunks owned by the user, cached for search_plan_cache_ttl_seconds."""
+    now = time.monotonic()
+    cached = _chunk_counts.get(user_id)
+    if cached and cached[0] > now:
+        return cached[1]
+    count = await db.scalar(select(func.count()).select_from(RecordChunk).where(RecordChunk.user_id == user_id))
+    if len(_chunk_counts) >= _MAX_CACHED_USERS:
+        _chunk_counts.clear()
+    _chunk_counts[user_id] = (now + settings.search_plan_cache_ttl_seconds, count)
+    return count
+
+
+async def apply_hnsw_settings(db: AsyncSession, ef_search: Optional[int] = None) -> None:
+    """Set pgvector's HNSW query parameters for the current transaction."""
+    await db.execute(
+        text("""
+            SELECT set_config('hnsw.ef_search', :ef_search, true),
+                   set_config('hnsw.iterative_scan', :iterative_scan, true),
+                   set_config('hnsw.max_scan_tuples', :max_scan_tuples, true)
+        """),
+        {
+            "ef_search": str(ef_search or settings.hnsw_ef_search),
+            "iterative_scan": settings.hnsw_iterative_scan,
+            "max_scan_tuples": str(settings.hnsw_max_scan_tuples),
+        },
+    )
+
+
+async def apply_search_plan(db: AsyncSession, user_id: UUID, ef_search: Optional[int] = None) -> str:
+    """Pick how the vector search scans a user's chunks and hint the planner for this transaction.
+
+    The HNSW index is shared by all users, so for a user with few chunks most
+    neighbours it returns belong to someone else and get filtered away. Those
+    users are better served by an exact scan: fetch their chunks through the
+    user_id index and sort by distance, which is also perfectly accurate.
+    Returns "exact" or "hnsw".
+    """
+    plan = settings.search_plan
+    if plan == "auto":
+        count = await user_chunk_count(db, user_id)
+        plan = "exact" if count <= settings.search_exact_scan_max_chunks else "hnsw"
+    if plan == "exact":
+        # SET LOCAL ends with the transaction; ORDER BY distance can no longer use the
+        # HNSW index scan, while the user_id index stays reachable via a bitmap scan
+        await db.execute(text("SET LOCAL enable_indexscan = off"))
+    else:
+        await apply_hnsw_settings(db, ef_search)
+    return plan
@@ -0,0 +1,66 @@
+from sqlalchemy import select, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.tag import Tag, RecordTag
+from typing import Dict, Iterable, List
+from uuid import UUID
+
+
+async def upsert_tags(db: AsyncSession, user_id: UUID, names: Iterable[str]) -> Dict[str, UUID]:
+    """Resolve tag names to ids for a user, creating the missing ones.
+
+    One INSERT ... ON CONFLICT DO NOTHING RETURNING for the new tags, plus one
+    lookup for the names that already existed. Does not commit.
+    """
+    unique_names = list(dict.fromkeys(names))
+    if not unique_names:
+        return {}
+
+    result = await db.execute(
+        insert(Tag)
+        .values([{"user_id": user_id, "name": name} for name in unique_names])
+        .on_conflict_do_nothing(index_elements=["user_id", "name"])
+        .returning(Tag.name, Tag.id)
+    )
+    tag_ids = {name: tag_id for name, tag_id in result}
+
+    existing_names = [name for name in unique_names if name not in tag_ids]
+    if existing_names:
+        result = await db.execute(
+            select(Tag.name, Tag.id).where(Tag.user_id == user_id, Tag.name.in_(existing_names))
+        )
+        tag_ids.update({name: tag_id for name, tag_id in result})
+    return tag_ids
+
+
+async def load_record_tags(db: AsyncSession, record_ids: Iterable[UUID]) -> Dict[UUID, List[str]]:
+    """Tag names per record for a set of records, in one query."""
+    record_ids = list(record_ids)
+    tags: Dict[UUID, List[str]] = {record_id: [] for record_id in record_ids}
+    if not record_ids:
+        return tags
+    result = await db.execute(
+        select(RecordTag.record_id, Tag.name)
+        .join(Tag, Tag.id == RecordTag.tag_id)
+        .where(RecordTag.record_id.in_(record_ids))
+    )
+    for record_id, name in result:
+        tags[record_id].append(name)
+    return tags
+
+
+async def resolve_tag_prefixes(db: AsyncSession, user_id: UUID, prefixes: Iterable[str]) -> List[UUID]:
+    """Ids of the user's tags starting with any of the prefixes, case-insensitively, in one query.
+
+    Served by the (user_id, normalized_name text_pattern_ops) index.
+    """
+    prefixes = [prefix.lower() for prefix in dict.fromkeys(prefixes)]
+    if not prefixes:
+        return []
+    result = await db.execute(
+        select(Tag.id).where(
+            Tag.user_id == user_id,
+            or_(*(Tag.normalized_name.startswith(prefix, autoescape=True) for prefix in prefixes)),
+        )
+    )
+    return list(result.scalars())
@@ -1,23 +1,353 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, case, func, and_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.embedding_job import EmbeddingJob
 from app.models.record import Record
-from app.services.embedding import get_embedding
+from app.models.record_chunk import RecordChunk
+from app.services.documents import build_chunks, compose_document, embed_chunks
+from app.services.embedding import embedding_column, embedding_column_name, embedding_models, embedding_source_hash
+from app.services.tags import load_record_tags
+import httpx
 import logging
-from typing import List
+from tenacity import RetryError
+from typing import Any, Dict, Iterable, List, Tuple
+from uuid import UUID
 
 logger = logging.getLogger(__name__)
 
+# Responses meaning the embedding service refused some input of the batch
+REJECTED_INPUT_STATUSES = {400, 413, 422}
 
-async def compute_embedding(record_id: str, notes: str, db: Session):
+
+async def enqueue_embedding_jobs(db: AsyncSession, record_ids: Iterable[UUID]) -> None:
+    """Queue records for (re-)embedding inside the caller's transaction. Does not commit.
+
+    An existing pending job is kept, but its row is locked by a no-op update.
+    The worker locks the same row before it compares the document hash and
+    stores vectors, so either it sees this transaction's changes, or this
+    insert waits until the worker has deleted the job and queues a new one.
+    """
+    rows = [{"record_id": record_id} for record_id in dict.fromkeys(record_ids)]
+    if not rows:
+        return
+    stmt = insert(EmbeddingJob).values(rows)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["record_id"],
+            index_where=EmbeddingJob.status == "pending",
+            set_={"run_after": EmbeddingJob.run_after},
+        )
+    )
+
+
+async def _delete_jobs(db: AsyncSession, job_ids: List[int]) -> None:
+    await db.execute(
+        delete(EmbeddingJob).where(EmbeddingJob.id.in_(job_ids)).execution_options(synchronize_session=False)
+    )
+
+
+async def _fail_jobs(db: AsyncSession, job_ids: List[int], error: str) -> None:
+    attempts = EmbeddingJob.attempts + 1
+    await db.execute(
+        update(EmbeddingJob)
+        .where(EmbeddingJob.id.in_(job_ids))
+        .values(
+            attempts=attempts,
+            last_error=error[:1000],
+            # Dead-letter after the last attempt, otherwise back off exponentially
+            status=case((attempts >= settings.embedding_job_max_attempts, "dead"), else_="pending"),
+            run_after=func.now() + func.make_interval(
+                0, 0, 0, 0, 0, 0, settings.embedding_job_retry_delay * func.power(2, EmbeddingJob.attempts)
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def store_chunk_embeddings(
+    db: AsyncSession,
+    records: Dict[UUID, Tuple[UUID, str]],
+    embeddings: Dict[str, Dict[UUID, List[Any]]],
+) -> None:
+    """Replace the chunks of each embedded record and stamp the record with its source hash.
+
+    `records` maps record id to (user id, composed document); `embeddings` maps
+    each model to its chunk vectors per record. Every record must be embedded
+    with the primary model; a shadow model's columns are cleared for the records
+    it is missing, leaving the gap to the backfill script. Does not commit.
+    """
+    record_ids = list(embeddings.get(settings.embedding_model, {}))
+    if not record_ids:
+        return
+    models = embedding_models()
+
+    def vector(model: str, record_id: UUID, index: int) -> Any:
+        vectors = embeddings.get(model, {}).get(record_id)
+        return vectors[index] if vectors is not None else None
+
+    await db.execute(
+        delete(RecordChunk).where(RecordChunk.record_id.in_(record_ids)).execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        insert(RecordChunk),
+        [
+            {
+                "record_id": record_id,
+                "user_id": records[record_id][0],
+                "chunk_index": index,
+                **{embedding_column_name(model): vector(model, record_id, index) for model in models},
+            }
+            for record_id in record_ids
+            for index in range(len(embeddings[settings.embedding_model][record_id]))
+        ],
+    )
+    # The record keeps its first chunk as its own vector
+    await db.execute(
+        update(Record),
+        [
+            {
+                "id": record_id,
+                **{embedding_column_name(model): vector(model, record_id, 0) for model in models},
+                "embedding_source_hash": embedding_source_hash(records[record_id][1]),
+            }
+            for record_id in record_ids
+        ],
+    )
+
+
+async def _requeue_jobs(db: AsyncSession, job_ids: List[int]) -> None:
+    await db.execute(
+        update(EmbeddingJob)
+        .where(EmbeddingJob.id.in_(job_ids))
+        .values(run_after=func.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _load_documents(db: AsyncSession, record_ids: List[UUID]) -> Dict[UUID, Tuple[Any, List[str], str]]:
+    """Current (record row, tags, composed document) per record that still exists."""
+    rows = (await db.execute(
+        select(
+            Record.id,
+            Record.user_id,
+            Record.name,
+            Record.notes,
+            Record.embedding_source_hash,
+            and_(*(embedding_column(Record, model).is_not(None) for model in embedding_models())).label("has_embedding"),
+        ).where(Record.id.in_(record_ids))
+    )).all()
+    tags = await load_record_tags(db, [row.id for row in rows])
+    return {row.id: (row, tags[row.id], compose_document(row.name, tags[row.id], row.notes)) for row in rows}
+
+
+async def process_embedding_jobs(db: AsyncSession, limit: int) -> int:
+    """Claim up to `limit` due jobs, embed the records' document chunks via /embed/batch and store them.
+
+    During a model switch every record is also embedded with the shadow model
+    (dual-write); a job completes once the primary model succeeded, and shadow
+    vectors the shadow model failed to produce are left to the backfill script.
+    Jobs are claimed with a lease (run_after pushed out by embedding_job_lease_seconds)
+    and the claim is committed before calling the embedding service, so no rows
+    stay locked meanwhile; a crashed worker's jobs come due again when the lease ends.
+    Vectors are only stored if the record's document is still the one embedded,
+    otherwise the job is re-queued. Any failure after the claim counts as an
+    attempt for every job, except inputs the service rejects, which fail only
+    their own jobs.
+    Returns the number of jobs claimed.
+    """
+    claimed = (await db.execute(
+        select(EmbeddingJob.id, EmbeddingJob.record_id)
+        .where(EmbeddingJob.status == "pending", EmbeddingJob.run_after <= func.now())
+        .order_by(EmbeddingJob.run_after)
+        .limit(limit)
+        .with_for_update(skip_locked=True, of=EmbeddingJob)
+    )).all()
+    if not claimed:
+        await db.rollback()
+        return 0
+
+    documents = await _load_documents(db, [job.record_id for job in claimed])
+    # Skip records whose stored vectors already match the current document, and deleted ones
+    up_to_date_job_ids = []
+    for job in claimed:
+        if job.record_id not in documents:
+            up_to_date_job_ids.append(job.id)
+            continue
+        row, _, document = documents[job.record_id]
+        if row.has_embedding and row.embedding_source_hash == embedding_source_hash(document):
+            up_to_date_job_ids.append(job.id)
+    jobs = [job for job in claimed if job.id not in up_to_date_job_ids]
+    if up_to_date_job_ids:
+        await _delete_jobs(db, up_to_date_job_ids)
+    if jobs:
+        await db.execute(
+            update(EmbeddingJob)
+            .where(EmbeddingJob.id.in_([job.id for job in jobs]))
+            .values(run_after=func.now() + func.make_interval(0, 0, 0, 0, 0, 0, settings.embedding_job_lease_seconds))
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+    if not jobs:
+        return len(claimed)
+
+    # No transaction is open while the embedding service works; any failure from
+    # here on counts as an attempt, so a poisoned batch still ends up dead-lettered
+    try:
+        await _embed_and_store(db, jobs, documents)
+    except Exception as e:
+        logger.error(f"Embedding {len(jobs)} records failed: {str(e)}")
+        await db.rollback()
+        await _fail_jobs(db, [job.id for job in jobs], str(e))
+        await db.commit()
+    if up_to_date_job_ids:
+        logger.info(f"{len(up_to_date_job_ids)} queued records were already up to date")
+    return len(claimed)
+
+
+def _rejected_inputs(error: Exception) -> bool:
+    """Whether the embedding service refused the request's inputs (rather than being unavailable)."""
+    if isinstance(error, RetryError):
+        error = error.last_attempt.exception()
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code in REJECTED_INPUT_STATUSES
+
+
+async def _embed_records(
+    chunks: Dict[UUID, List[str]], model: str
+) -> Tuple[Dict[UUID, List[Any]], Dict[UUID, str]]:
+    """Embed the records' chunks with `model`, returning (vectors, error) per record.
+
+    When the service rejects a batch's inputs, the records are bisected and
+    retried so only the offending ones fail. Other errors propagate.
+    """
     try:
-        # Combine text for embedding
-        embedding = await get_embedding(notes)
-        # Update record with embedding
-        db_record = db.query(Record).filter(Record.id == record_id).first()
-        if db_record:
-            db_record.all_mpnet_base_v2_embedding = embedding
-            db.commit()
-            logger.info(f"Embedding updated for record {record_id}")
-        else:
-            logger.error(f"Record {record_id} not found for embedding update")
+        return await embed_chunks(chunks, model), {}
     except Exception as e:
-        logger.error(f"Failed to compute embedding for record {record_id}: {str(e)}")
\ No newline at end of file
+        if not _rejected_inputs(e):
+            raise
+        if len(chunks) == 1:
+            return {}, {record_id: str(e) for record_id in chunks}
+    record_ids = list(chunks)
+    middle = len(record_ids) // 2
+    embedded: Dict[UUID, List[Any]] = {}
+    errors: Dict[UUID, str] = {}
+    for half in (record_ids[:middle], record_ids[middle:]):
+        half_embedded, half_errors = await _embed_records({record_id: chunks[record_id] for record_id in half}, model)
+        embedded.update(half_embedded)
+        errors.update(half_errors)
+    return embedded, errors
+
+
+async def _embed_and_store(db: AsyncSession, jobs: List[Any], documents: Dict[UUID, Tuple[Any, List[str], str]]) -> None:
+    models = embedding_models()
+    embedded_documents: Dict[UUID, str] = {}
+    chunks: Dict[UUID, List[str]] = {}
+    for job in jobs:
+        row, tags, document = documents[job.record_id]
+        embedded_documents[job.record_id] = document
+        chunks[job.record_id] = build_chunks(row.name, tags, row.notes)
+    primary, *shadow_models = models
+    embeddings: Dict[str, Dict[UUID, List[Any]]] = {}
+    embeddings[primary], errors = await _embed_records(chunks, primary)
+    for model in shadow_models:
+        # A shadow model under evaluation never holds back the primary vectors;
+        # records it misses keep an empty shadow column for the backfill to fill
+        try:
+            embeddings[model], shadow_errors = await _embed_records(
+                {record_id: chunks[record_id] for record_id in embeddings[primary]}, model
+            )
+        except Exception as e:
+            logger.warning(f"Shadow embedding with {model} failed: {str(e)}")
+            embeddings[model], shadow_errors = {}, {}
+        if shadow_errors:
+            logger.warning(f"Shadow model {model} rejected {len(shadow_errors)} records")
+
+    # Lock the jobs again (see enqueue_embedding_jobs), then re-read the records
+    locked_job_ids = set((await db.execute(
+        select(EmbeddingJob.id)
+        .where(EmbeddingJob.id.in_([job.id for job in jobs]), EmbeddingJob.status == "pending")
+        .with_for_update()
+    )).scalars())
+    current = await _load_documents(db, [job.record_id for job in jobs if job.id in locked_job_ids])
+
+    # Only records embedded with the primary model and unchanged since are written
+    embedded_ids = set(embeddings[primary])
+    done_ids = {
+        job.record_id for job in jobs
+        if job.id in locked_job_ids and job.record_id in embedded_ids and job.record_id in current
+        and current[job.record_id][2] == embedded_documents[job.record_id]
+    }
+    await store_chunk_embeddings(
+        db,
+        {record_id: (current[record_id][0].user_id, embedded_documents[record_id]) for record_id in done_ids},
+        {
+            model: {record_id: vectors[record_id] for record_id in done_ids if record_id in vectors}
+            for model, vectors in embeddings.items()
+        },
+    )
+    done_job_ids = [job.id for job in jobs if job.record_id in done_ids]
+    failed_jobs = [job for job in jobs if job.id in locked_job_ids and job.record_id not in embedded_ids]
+    changed_job_ids = [
+        job.id for job in jobs
+        if job.id in locked_job_ids and job.record_id in embedded_ids and job.record_id not in done_ids
+    ]
+    if done_job_ids:
+        await _delete_jobs(db, done_job_ids)
+    failed_by_error: Dict[str, List[int]] = {}
+    for job in failed_jobs:
+        failed_by_error.setdefault(errors.get(job.record_id, "Embedding missing from batch response"), []).append(job.id)
+    for error, job_ids in failed_by_error.items():
+        await _fail_jobs(db, job_ids, error)
+    if changed_job_ids:
+        # Edited (or deleted) while embedding; a fresh run picks up the new document
+        await _requeue_jobs(db, changed_job_ids)
+    await db.commit()
+    shadow_counts = "".join(
+        f", {sum(record_id in embeddings[model] for record_id in done_ids)} also with {model}" for model in shadow_models
+    )
+    logger.info(
+        f"Embedded {len(done_job_ids)} records with {primary}{shadow_counts}, "
+        f"{len(changed_job_ids)} changed meanwhile, {len(failed_jobs)} failed"
+    )
+
+
+async def embedding_queue_stats(db: AsyncSession) -> Dict[str, Any]:
+    """Queue depth metrics for monitoring."""
+    row = (await db.execute(
+        select(
+            func.count().filter(EmbeddingJob.status == "pending").label("pending"),
+            func.count().filter(EmbeddingJob.status == "pending", EmbeddingJob.run_after <= func.now()).label("ready"),
+            func.count().filter(EmbeddingJob.status == "dead").label("dead"),
+            func.extract("epoch", func.now() - func.min(EmbeddingJob.created_at).filter(
+                EmbeddingJob.status == "pending"
+            )).label("oldest_pending_seconds"),
+        )
+    )).one()
+    return {
+        "pending": row.pending,
+        "ready": row.ready,
+        "dead": row.dead,
+        "oldest_pending_seconds": float(row.oldest_pending_seconds) if row.oldest_pending_seconds is not None else None,
+    }
+
+
+async def embedding_backfill_stats(db: AsyncSession) -> Dict[str, Any]:
+    """Share of records embedded with each model; cut over once the shadow model reaches 100%."""
+    models = embedding_models()
+    row = (await db.execute(
+        select(
+            func.count().label("records"),
+            *(func.count(embedding_column(Record, model)).label(model) for model in models),
+        )
+    )).one()
+    mapping = row._mapping
+    return {
+        "records": mapping["records"],
+        "models": {
+            model: {
+                "embedded": mapping[model],
+                "percent": round(100.0 * mapping[model] / mapping["records"], 2) if mapping["records"] else 100.0,
+            }
+            for model in models
+        },
+    }
@@ -0,0 +1,32 @@
+from sqlalchemy import select, delete, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.query_embedding import QueryEmbedding
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def purge_expired_query_embeddings(db: AsyncSession, ttl_seconds: float, batch_size: int) -> int:
+    """Delete shared query embeddings older than `ttl_seconds` in batches of `batch_size`, committing each.
+
+    Returns the number deleted.
+    """
+    purged = 0
+    while True:
+        expired = (
+            select(QueryEmbedding.model, QueryEmbedding.text_hash)
+            .where(QueryEmbedding.created_at <= func.now() - func.make_interval(0, 0, 0, 0, 0, 0, ttl_seconds))
+            .limit(batch_size)
+        )
+        result = await db.execute(
+            delete(QueryEmbedding)
+            .where(tuple_(QueryEmbedding.model, QueryEmbedding.text_hash).in_(expired))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        purged += result.rowcount
+        if result.rowcount < batch_size:
+            break
+    if purged:
+        logger.info(f"Purged {purged} expired query embeddings")
+    return purged
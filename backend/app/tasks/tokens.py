@@ -0,0 +1,29 @@
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.token import RefreshToken
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def purge_expired_refresh_tokens(db: AsyncSession, batch_size: int) -> int:
+    """Delete expired refresh tokens in batches of `batch_size`, committing each. Returns the number deleted."""
+    purged = 0
+    while True:
+        expired = (
+            select(RefreshToken.id)
+            .where(RefreshToken.expires_at <= datetime.utcnow())
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            delete(RefreshToken).where(RefreshToken.id.in_(expired)).execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        purged += result.rowcount
+        if result.rowcount < batch_size:
+            break
+    if purged:
+        logger.info(f"Purged {purged} expired refresh tokens")
+    return purged
@@ -1,21 +1,88 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt, ExpiredSignatureError
 from app.config import settings
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models.user import User
 from app.models.token import RefreshToken
 from uuid import UUID, uuid4
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
 import logging
 import hashlib
+import os
+import time
 
 logger = logging.getLogger(__name__)
 
 bearer_scheme = HTTPBearer()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme), db: Session = Depends(get_db)) -> UUID:
+class ValidUserCache:
+    """In-process TTL cache of user ids known to exist, so most requests skip the users table.
+
+    Logging out or deleting a user must call forget(); it also rejects that
+    user's access tokens issued before that moment, which would otherwise stay
+    valid until they expire.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 100_000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._expires_at: Dict[UUID, float] = {}
+        self._revoked_at: Dict[UUID, float] = {}
+
+    def is_valid(self, user_id: UUID) -> bool:
+        expires_at = self._expires_at.get(user_id)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._expires_at[user_id]
+            return False
+        return True
+
+    def remember(self, user_id: UUID) -> None:
+        if len(self._expires_at) >= self.max_entries:
+            self._expires_at.clear()
+        self._expires_at[user_id] = time.monotonic() + self.ttl_seconds
+        self._revoked_at.pop(user_id, None)
+
+    def forget(self, user_id: UUID) -> None:
+        self._expires_at.pop(user_id, None)
+        self._revoked_at[user_id] = time.time()
+
+    def is_revoked(self, user_id: UUID, issued_at: Optional[float]) -> bool:
+        revoked_at = self._revoked_at.get(user_id)
+        if revoked_at is None:
+            return False
+        if time.time() - revoked_at > ACCESS_TOKEN_LIFETIME.total_seconds():
+            # Every token issued before the revocation has expired by now
+            del self._revoked_at[user_id]
+            return False
+        return issued_at is None or issued_at <= revoked_at
+
+
+ACCESS_TOKEN_LIFETIME = timedelta(minutes=1)
+REFRESH_TOKEN_LIFETIME = timedelta(days=30)
+valid_users = ValidUserCache(settings.auth_user_cache_ttl_seconds)
+
+
+async def get_current_user(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_db),
+) -> UUID:
+    """Id of the authenticated user.
+
+    Verified once per request (memoized on request.state). Users seen within
+    auth_user_cache_ttl_seconds are trusted from the signed claims alone; the
+    session is only used on a cache miss.
+    """
+    cached_user_id = getattr(request.state, "user_id", None)
+    if cached_user_id is not None:
+        return cached_user_id
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -35,11 +102,17 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(b
         if user_id is None:
             logger.warning("Token missing 'sub' claim")
             raise credentials_exception
-        user = db.query(User).filter(User.id == UUID(user_id)).first()
-        if user is None:
-            logger.warning(f"No user found for ID: {user_id}")
+        user_uuid = UUID(user_id)
+        if valid_users.is_revoked(user_uuid, payload.get("iat")):
+            logger.warning(f"Token issued before logout for user ID: {user_id}")
             raise credentials_exception
-        return user.id
+        if not valid_users.is_valid(user_uuid):
+            if await db.scalar(select(User.id).where(User.id == user_uuid)) is None:
+                logger.warning(f"No user found for ID: {user_id}")
+                raise credentials_exception
+            valid_users.remember(user_uuid)
+        request.state.user_id = user_uuid
+        return user_uuid
     except ExpiredSignatureError:
         logger.warning("Token has expired")
         raise HTTPException(
@@ -47,22 +120,40 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(b
             detail="Token has expired",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    except ValueError:
+        logger.warning("Token 'sub' claim is not a user id")
+        raise credentials_exception
     except JWTError as e:
         logger.error(f"JWT validation failed: {str(e)}")
         raise credentials_exception
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=1)
-    to_encode.update({"exp": expire, "type": "access"})
+    now = datetime.now(timezone.utc)
+    to_encode.update({"exp": now + ACCESS_TOKEN_LIFETIME, "iat": now.timestamp(), "type": "access"})
     return jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
 
-def create_refresh_token(data: dict) -> str:
+def create_refresh_token(data: dict, jti: UUID) -> str:
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(days=30)
-    to_encode.update({"exp": expire, "type": "refresh"})
+    expire = datetime.utcnow() + REFRESH_TOKEN_LIFETIME
+    to_encode.update({"exp": expire, "type": "refresh", "jti": str(jti)})
     return jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
 
+def issue_refresh_token(db: AsyncSession, user_id: UUID, email: str) -> str:
+    """Create a refresh token and store its salted hash under its jti. Does not commit."""
+    jti = uuid4()
+    token = create_refresh_token({"sub": str(user_id), "email": email}, jti)
+    salt = os.urandom(32).hex()
+    db.add(RefreshToken(
+        id=uuid4(),
+        jti=jti,
+        user_id=user_id,
+        hashed_token=hash_token(token, salt),
+        salt=salt,
+        expires_at=datetime.utcnow() + REFRESH_TOKEN_LIFETIME
+    ))
+    return token
+
 def hash_token(token: str, salt: str) -> str:
     """Hash the token with a provided salt using SHA-256."""
     return hashlib.sha256((token + salt).encode('utf-8')).hexdigest()
@@ -76,7 +167,12 @@ def verify_token(token: str, hashed_token: str, salt: str) -> bool:
         logger.error(f"Token verification failed: {str(e)}")
         return False
 
-async def validate_refresh_token(token: str, db: Session) -> UUID:
+async def validate_refresh_token(token: str, db: AsyncSession) -> RefreshToken:
+    """Return the stored row of a valid refresh token, locked until the caller's transaction ends.
+
+    The row is found through the unique jti index. Callers rotating the token
+    delete it in the same transaction, so a token can be redeemed only once.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid or expired refresh token",
@@ -95,14 +191,22 @@ async def validate_refresh_token(token: str, db: Session) -> UUID:
         if user_id is None:
             logger.warning("Refresh token missing 'sub' claim")
             raise credentials_exception
-        token_record = db.query(RefreshToken).filter(
+        query = select(RefreshToken).where(
             RefreshToken.user_id == UUID(user_id),
             RefreshToken.expires_at > datetime.utcnow()
-        ).first()
+        ).with_for_update()
+        jti = payload.get("jti")
+        if jti is not None:
+            query = query.where(RefreshToken.jti == UUID(jti))
+        # Tokens issued before jti claims existed are still matched by user alone
+        token_record = await db.scalar(query)
         if token_record is None or not verify_token(token, token_record.hashed_token, token_record.salt):
             logger.warning(f"No valid refresh token found for user ID: {user_id}")
             raise credentials_exception
-        return UUID(user_id)
+        return token_record
+    except ValueError:
+        logger.warning("Refresh token has malformed 'sub' or 'jti' claims")
+        raise credentials_exception
     except (JWTError, ExpiredSignatureError) as e:
         logger.error(f"Refresh token validation failed: {str(e)}")
-        raise credentials_exception
\ No newline at end of file
+        raise credentials_exception
@@ -0,0 +1,91 @@
+"""
+Embedding worker: drains the embedding_jobs queue into /embed/batch calls.
+It also purges expired refresh tokens and shared query embeddings periodically.
+
+Usage:
+    docker exec -it peoplepad-backend python -m app.worker
+"""
+
+import asyncio
+import logging
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.services.embedding import close_http_client
+from app.tasks.embeddings import process_embedding_jobs, embedding_queue_stats
+from app.tasks.query_embeddings import purge_expired_query_embeddings
+from app.tasks.tokens import purge_expired_refresh_tokens
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s.%(msecs)03d | %(levelname)-8s | %(name)s | %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    force=True,
+)
+logger = logging.getLogger(__name__)
+
+
+async def drain(worker_id: int):
+    """Process batches until the queue is empty, then poll."""
+    while True:
+        try:
+            async with SessionLocal() as db:
+                claimed = await process_embedding_jobs(db, settings.embedding_batch_size)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} failed to process embedding jobs: {str(e)}")
+            claimed = 0
+        if claimed == 0:
+            await asyncio.sleep(settings.embedding_worker_poll_interval)
+
+
+async def report():
+    while True:
+        try:
+            async with SessionLocal() as db:
+                logger.info(f"Embedding queue: {await embedding_queue_stats(db)}")
+        except Exception as e:
+            logger.error(f"Failed to read embedding queue stats: {str(e)}")
+        await asyncio.sleep(settings.embedding_worker_stats_interval)
+
+
+async def purge_tokens():
+    while True:
+        try:
+            async with SessionLocal() as db:
+                await purge_expired_refresh_tokens(db, settings.token_purge_batch_size)
+        except Exception as e:
+            logger.error(f"Failed to purge expired refresh tokens: {str(e)}")
+        await asyncio.sleep(settings.token_purge_interval)
+
+
+async def purge_query_embeddings():
+    while True:
+        try:
+            async with SessionLocal() as db:
+                await purge_expired_query_embeddings(
+                    db, settings.embedding_store_ttl_seconds, settings.embedding_store_purge_batch_size
+                )
+        except Exception as e:
+            logger.error(f"Failed to purge expired query embeddings: {str(e)}")
+        await asyncio.sleep(settings.embedding_store_purge_interval)
+
+
+async def run_worker():
+    logger.info(f"Starting embedding worker with {settings.embedding_worker_concurrency} concurrent batches")
+    try:
+        await asyncio.gather(
+            report(),
+            purge_tokens(),
+            purge_query_embeddings(),
+            *(drain(worker_id) for worker_id in range(settings.embedding_worker_concurrency)),
+        )
+    finally:
+        await close_http_client()
+        await engine.dispose()
+
+
+def main():
+    asyncio.run(run_worker())
+
+
+if __name__ == "__main__":
+    main()
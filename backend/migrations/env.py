@@ -14,18 +14,21 @@ from app.models.user import User
 from app.models.record import Record
 from app.models.tag import Tag, RecordTag
 from app.models.token import RefreshToken
+from app.models.query_embedding import QueryEmbedding
+from app.models.embedding_job import EmbeddingJob
+from app.models.record_chunk import RecordChunk
 
 # Alembic Config object
 config = context.config
 
 # Override sqlalchemy.url dynamically
-config.set_main_option("sqlalchemy.url", settings.database_url)
+config.set_main_option("sqlalchemy.url", settings.sync_database_url)
 
 target_metadata = Base.metadata
 
 def run_migrations_offline():
     context.configure(
-        url=settings.database_url,
+        url=settings.sync_database_url,
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
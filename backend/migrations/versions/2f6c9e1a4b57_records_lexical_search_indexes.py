@@ -0,0 +1,39 @@
+"""records lexical search indexes
+
+Revision ID: 2f6c9e1a4b57
+Revises: 8a3f5c2e9d14
+Create Date: 2025-11-25 20:31:14.663902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '2f6c9e1a4b57'
+down_revision = '8a3f5c2e9d14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Apply the migration."""
+    # pg_trgm is already enabled by the initial migration
+    op.add_column('records', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(notes, ''))", persisted=True),
+        nullable=True,
+    ))
+    op.create_index('idx_records_name_trgm', 'records', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('idx_records_notes_trgm', 'records', ['notes'], unique=False, postgresql_using='gin', postgresql_ops={'notes': 'gin_trgm_ops'})
+    op.create_index('idx_records_search_vector', 'records', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    """Revert the migration."""
+    op.drop_index('idx_records_search_vector', table_name='records', postgresql_using='gin')
+    op.drop_index('idx_records_notes_trgm', table_name='records', postgresql_using='gin', postgresql_ops={'notes': 'gin_trgm_ops'})
+    op.drop_index('idx_records_name_trgm', table_name='records', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.drop_column('records', 'search_vector')
@@ -0,0 +1,33 @@
+"""query embeddings cache table
+
+Revision ID: 3c1a7e9b2d40
+Revises: fa728d2c7f98
+Create Date: 2025-11-08 18:12:40.210551
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1a7e9b2d40'
+down_revision = 'fa728d2c7f98'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Apply the migration."""
+    op.create_table('query_embeddings',
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('text_hash', sa.String(), nullable=False),
+    sa.Column('embedding', Vector(dim=768), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('model', 'text_hash', name='query_embeddings_pkey')
+    )
+
+
+def downgrade():
+    """Revert the migration."""
+    op.drop_table('query_embeddings')
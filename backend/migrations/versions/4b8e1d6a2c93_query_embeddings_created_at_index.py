@@ -0,0 +1,27 @@
+"""query embeddings created_at index
+
+Revision ID: 4b8e1d6a2c93
+Revises: 9c4e2a7b5f18
+Create Date: 2025-12-03 10:24:17.512904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b8e1d6a2c93'
+down_revision = '9c4e2a7b5f18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Apply the migration."""
+    # The worker purges expired shared query embeddings by age
+    op.create_index('idx_query_embeddings_created_at', 'query_embeddings', ['created_at'], unique=False)
+
+
+def downgrade():
+    """Revert the migration."""
+    op.drop_index('idx_query_embeddings_created_at', table_name='query_embeddings')
@@ -0,0 +1,46 @@
+"""record chunks hnsw build options
+
+Revision ID: 5e0b8d3f71c6
+Revises: c47d9a1e0b83
+Create Date: 2025-11-21 19:42:08.517630
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5e0b8d3f71c6'
+down_revision = 'c47d9a1e0b83'
+branch_labels = None
+depends_on = None
+
+# pgvector defaults are m = 16, ef_construction = 64; a denser graph holds up
+# better when most neighbours are filtered out by user_id
+M = 24
+EF_CONSTRUCTION = 128
+
+
+def rebuild_index(m, ef_construction):
+    # Build the replacement concurrently so search keeps its index meanwhile
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_record_chunks_all_mpnet_base_v2_embedding_new")
+        op.execute(f"""
+            CREATE INDEX CONCURRENTLY idx_record_chunks_all_mpnet_base_v2_embedding_new
+            ON record_chunks USING hnsw (all_mpnet_base_v2_embedding vector_cosine_ops)
+            WITH (m = {m}, ef_construction = {ef_construction})
+        """)
+    op.execute("DROP INDEX idx_record_chunks_all_mpnet_base_v2_embedding")
+    op.execute(
+        "ALTER INDEX idx_record_chunks_all_mpnet_base_v2_embedding_new "
+        "RENAME TO idx_record_chunks_all_mpnet_base_v2_embedding"
+    )
+
+
+def upgrade():
+    """Apply the migration."""
+    rebuild_index(M, EF_CONSTRUCTION)
+
+
+def downgrade():
+    """Revert the migration."""
+    rebuild_index(16, 64)
@@ -0,0 +1,30 @@
+"""tag filter indexes
+
+Revision ID: 6d1b7f0c3e92
+Revises: 2f6c9e1a4b57
+Create Date: 2025-11-27 09:48:27.140518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d1b7f0c3e92'
+down_revision = '2f6c9e1a4b57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Apply the migration."""
+    op.add_column('tags', sa.Column('normalized_name', sa.String(), sa.Computed('lower(name)', persisted=True), nullable=True))
+    op.create_index('idx_tags_user_id_normalized_name', 'tags', ['user_id', 'normalized_name'], unique=False, postgresql_ops={'normalized_name': 'text_pattern_ops'})
+    op.create_index('idx_record_tags_tag_id_record_id', 'record_tags', ['tag_id', 'record_id'], unique=False)
+
+
+def downgrade():
+    """Revert the migration."""
+    op.drop_index('idx_record_tags_tag_id_record_id', table_name='record_tags')
+    op.drop_index('idx_tags_user_id_normalized_name', table_name='tags', postgresql_ops={'normalized_name': 'text_pattern_ops'})
+    op.drop_column('tags', 'normalized_name')
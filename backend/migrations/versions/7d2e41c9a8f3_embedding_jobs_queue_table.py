@@ -0,0 +1,47 @@
+"""embedding jobs queue table
+
+Revision ID: 7d2e41c9a8f3
+Revises: 3c1a7e9b2d40
+Create Date: 2025-11-12 21:04:17.553012
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2e41c9a8f3'
+down_revision = '3c1a7e9b2d40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Apply the migration."""
+    op.create_table('embedding_jobs',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('record_id', sa.UUID(), nullable=False),
+    sa.Column('status', sa.String(), server_default='pending', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('run_after', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['record_id'], ['records.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_embedding_jobs_pending_record_id', 'embedding_jobs', ['record_id'], unique=True, postgresql_where=sa.text("status = 'pending'"))
+    op.create_index('idx_embedding_jobs_pending_run_after', 'embedding_jobs', ['run_after'], unique=False, postgresql_where=sa.text("status = 'pending'"))
+
+    # Records whose BackgroundTasks embedding was lost get picked up by the worker
+    op.execute("""
+        INSERT INTO embedding_jobs (record_id)
+        SELECT id FROM records
+        WHERE all_mpnet_base_v2_embedding IS NULL AND notes IS NOT NULL AND notes != ''
+    """)
+
+
+def downgrade():
+    """Revert the migration."""
+    op.drop_index('idx_embedding_jobs_pending_run_after', table_name='embedding_jobs', postgresql_where=sa.text("status = 'pending'"))
+    op.drop_index('uq_embedding_jobs_pending_record_id', table_name='embedding_jobs', postgresql_where=sa.text("status = 'pending'"))
+    op.drop_table('embedding_jobs')
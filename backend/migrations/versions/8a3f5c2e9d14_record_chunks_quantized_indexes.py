@@ -0,0 +1,37 @@
+"""record chunks quantized indexes
+
+Revision ID: 8a3f5c2e9d14
+Revises: 5e0b8d3f71c6
+Create Date: 2025-11-23 11:06:52.208341
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8a3f5c2e9d14'
+down_revision = '5e0b8d3f71c6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Apply the migration."""
+    # Expression indexes: the table keeps float32 vectors for exact re-ranking
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_record_chunks_all_mpnet_base_v2_embedding_halfvec
+            ON record_chunks USING hnsw ((all_mpnet_base_v2_embedding::halfvec(768)) halfvec_cosine_ops)
+            WITH (m = 24, ef_construction = 128)
+        """)
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_record_chunks_all_mpnet_base_v2_embedding_binary
+            ON record_chunks USING hnsw ((binary_quantize(all_mpnet_base_v2_embedding)::bit(768)) bit_hamming_ops)
+            WITH (m = 24, ef_construction = 128)
+        """)
+
+
+def downgrade():
+    """Revert the migration."""
+    op.drop_index('idx_record_chunks_all_mpnet_base_v2_embedding_binary', table_name='record_chunks')
+    op.drop_index('idx_record_chunks_all_mpnet_base_v2_embedding_halfvec', table_name='record_chunks')
@@ -0,0 +1,35 @@
+"""refresh token jti
+
+Revision ID: 9c4e2a7b5f18
+Revises: 6d1b7f0c3e92
+Create Date: 2025-11-29 16:12:40.385127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e2a7b5f18'
+down_revision = '6d1b7f0c3e92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Apply the migration."""
+    op.add_column('refresh_tokens', sa.Column('jti', sa.UUID(), nullable=True))
+    # Tokens issued before this carry no jti claim and are still found by user_id
+    op.execute("UPDATE refresh_tokens SET jti = id")
+    op.alter_column('refresh_tokens', 'jti', nullable=False)
+    op.create_unique_constraint('refresh_tokens_jti_key', 'refresh_tokens', ['jti'])
+    op.create_index(op.f('ix_refresh_tokens_user_id'), 'refresh_tokens', ['user_id'], unique=False)
+    op.create_index('idx_refresh_tokens_expires_at', 'refresh_tokens', ['expires_at'], unique=False)
+
+
+def downgrade():
+    """Revert the migration."""
+    op.drop_index('idx_refresh_tokens_expires_at', table_name='refresh_tokens')
+    op.drop_index(op.f('ix_refresh_tokens_user_id'), table_name='refresh_tokens')
+    op.drop_constraint('refresh_tokens_jti_key', 'refresh_tokens', type_='unique')
+    op.drop_column('refresh_tokens', 'jti')
@@ -0,0 +1,32 @@
+"""embedding source hash column
+
+Revision ID: b91f0c6e5a27
+Revises: 7d2e41c9a8f3
+Create Date: 2025-11-14 19:42:03.118245
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b91f0c6e5a27'
+down_revision = '7d2e41c9a8f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Apply the migration."""
+    op.add_column('records', sa.Column('embedding_source_hash', sa.String(length=64), nullable=True))
+    # Existing vectors were computed from the current notes
+    op.execute("""
+        UPDATE records
+        SET embedding_source_hash = encode(sha256(convert_to(notes, 'UTF8')), 'hex')
+        WHERE all_mpnet_base_v2_embedding IS NOT NULL AND notes IS NOT NULL AND notes != ''
+    """)
+
+
+def downgrade():
+    """Revert the migration."""
+    op.drop_column('records', 'embedding_source_hash')
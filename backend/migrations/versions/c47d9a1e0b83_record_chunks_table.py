@@ -0,0 +1,55 @@
+"""record chunks table
+
+Revision ID: c47d9a1e0b83
+Revises: b91f0c6e5a27
+Create Date: 2025-11-18 22:15:36.904117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47d9a1e0b83'
+down_revision = 'b91f0c6e5a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Apply the migration."""
+    op.create_table('record_chunks',
+    sa.Column('id', sa.UUID(), server_default=sa.text('uuid_generate_v4()'), nullable=False),
+    sa.Column('record_id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('chunk_index', sa.Integer(), nullable=False),
+    sa.Column('all_mpnet_base_v2_embedding', Vector(dim=768), nullable=True),
+    sa.ForeignKeyConstraint(['record_id'], ['records.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('record_id', 'chunk_index', name='record_chunks_record_id_chunk_index_key')
+    )
+    op.create_index(op.f('ix_record_chunks_user_id'), 'record_chunks', ['user_id'], unique=False)
+    op.create_index('idx_record_chunks_all_mpnet_base_v2_embedding', 'record_chunks', ['all_mpnet_base_v2_embedding'], unique=False, postgresql_using='hnsw', postgresql_ops={'all_mpnet_base_v2_embedding': 'vector_cosine_ops'})
+
+    # Seed one chunk per record from the existing notes-only vectors so search keeps
+    # working, then queue every record so the worker re-embeds the composed documents
+    op.execute("""
+        INSERT INTO record_chunks (record_id, user_id, chunk_index, all_mpnet_base_v2_embedding)
+        SELECT id, user_id, 0, all_mpnet_base_v2_embedding
+        FROM records
+        WHERE all_mpnet_base_v2_embedding IS NOT NULL
+    """)
+    op.execute("""
+        INSERT INTO embedding_jobs (record_id)
+        SELECT id FROM records
+        ON CONFLICT (record_id) WHERE status = 'pending' DO NOTHING
+    """)
+
+
+def downgrade():
+    """Revert the migration."""
+    op.drop_index('idx_record_chunks_all_mpnet_base_v2_embedding', table_name='record_chunks', postgresql_using='hnsw', postgresql_ops={'all_mpnet_base_v2_embedding': 'vector_cosine_ops'})
+    op.drop_index(op.f('ix_record_chunks_user_id'), table_name='record_chunks')
+    op.drop_table('record_chunks')
@@ -1,171 +1,303 @@
 """
 Migration script to re-embed records with a new embedding model.
 
+Each record is embedded as its composed document (name + tags + notes), split
+into chunks like the embedding worker does; the first chunk goes to the
+record's column and every chunk to the matching record_chunks column.
+
+Records are streamed in keyset-paginated pages (ordered by id), up to
+--concurrency pages are embedded at once, and each page is written back with
+one bulk UPDATE ... FROM (VALUES ...) and one bulk upsert. The last id below
+which every page has been written is saved to a checkpoint file, so an
+interrupted run resumes where it stopped.
+
+With --model set to EMBEDDING_SHADOW_MODEL this backfills the shadow columns
+while the worker dual-writes new changes; only the primary model's run stamps
+embedding_source_hash, so a shadow backfill never hides a pending re-embed.
+
 Usage:
-    docker exec -it peoplepad-backend python -m scripts.migrate_embed_model
+    docker exec -it peoplepad-backend python -m scripts.migrate_embed_model [--model all-mpnet-base-v2] [--concurrency 4] [--reset]
 """
 
+import argparse
 import asyncio
-import httpx
-from sqlalchemy import create_engine, select, text
-from sqlalchemy.orm import sessionmaker
-from typing import List, Dict, Any
+import json
+import os
+import time
+from sqlalchemy import text
+from typing import List, Dict, Any, Optional, Tuple
+from uuid import UUID
 import sys
 
 # Import your models and settings
-from app.models.record import Record
 from app.config import settings
+from app.database import SessionLocal, engine
+from app.services.documents import build_chunks, compose_document, embed_chunks
+from app.services.embedding import close_http_client, embedding_column_name, embedding_source_hash
+
+PAGE_SIZE = 100  # Records per page; their chunks are split into /embed/batch calls of at most 100
+
+
+def values_clause(rows: List[Tuple[Any, ...]], casts: List[str]) -> Tuple[str, Dict[str, Any]]:
+    """Build a `VALUES (...), (...)` clause with bound parameters for a bulk statement."""
+    params = {}
+    tuples = []
+    for row_index, row in enumerate(rows):
+        placeholders = []
+        for column_index, (value, cast) in enumerate(zip(row, casts)):
+            name = f"p{row_index}_{column_index}"
+            params[name] = value
+            placeholders.append(f"CAST(:{name} AS {cast})")
+        tuples.append(f"({', '.join(placeholders)})")
+    return f"VALUES {', '.join(tuples)}", params
+
+
+async def read_pages(column_name: str, after: Optional[UUID], page_size: int):
+    """Yield pages of records ordered by id, starting after `after` (keyset pagination)."""
+    while True:
+        async with SessionLocal() as db:
+            rows = (await db.execute(
+                text(f"""
+                    SELECT r.id, r.user_id, r.name, r.notes, r.embedding_source_hash,
+                           r.{column_name} IS NOT NULL AS has_embedding,
+                           COALESCE(array_agg(t.name) FILTER (WHERE t.name IS NOT NULL), '{{}}') AS tags
+                    FROM records r
+                    LEFT JOIN record_tags rt ON rt.record_id = r.id
+                    LEFT JOIN tags t ON t.id = rt.tag_id
+                    WHERE CAST(:after AS uuid) IS NULL OR r.id > CAST(:after AS uuid)
+                    GROUP BY r.id
+                    ORDER BY r.id
+                    LIMIT :limit
+                """),
+                {"after": after, "limit": page_size}
+            )).all()
+        if not rows:
+            return
+        yield rows
+        after = rows[-1].id
 
-BATCH_SIZE = 100  # Max batch size supported by embedding service
-
-
-async def get_embeddings_batch(
-        client: httpx.AsyncClient,
-        records: List[Dict[str, Any]]
-) -> List[Dict[str, Any]]:
-    """
-    Get embeddings for a batch of records.
-
-    Args:
-        client: HTTPX async client
-        records: List of dicts with 'id' and 'text' keys
-
-    Returns:
-        List of dicts with 'id' and 'embedding' from the service
-    """
-    batch_request = {
-        "inputs": [{"id": str(r["id"]), "text": r["text"]} for r in records],
-        "model": settings.embedding_model,
-        "encoding_format": "float"
-    }
 
-    try:
-        response = await client.post(
-            f"{settings.embedding_service_url}/batch",
-            headers={
-                "Authorization": f"Bearer {settings.embedding_service_key}",
-                "Content-Type": "application/json"
-            },
-            json=batch_request,
-            timeout=30.0
-        )
-        response.raise_for_status()
-        data = response.json()
-        return data.get("data", [])
-    except httpx.HTTPError as e:
-        print(f"Error calling embedding service: {e}")
-        raise
-
-
-def update_embeddings_in_db(
-        session,
-        embeddings: List[Dict[str, Any]],
-        column_name: str
+async def update_embeddings_in_db(
+        records: Dict[UUID, Dict[str, Any]],
+        embeddings: Dict[UUID, List[Any]],
+        column_name: str,
+        stamp_hash: bool = True
 ):
     """
-    Update the database with new embeddings.
+    Write a page of embeddings with set-based statements in one transaction.
 
     Args:
-        session: SQLAlchemy session
-        embeddings: List of dicts with 'id' and 'embedding'
+        records: Dicts with 'user_id' and 'document' keyed by record id
+        embeddings: Chunk vectors keyed by record id
         column_name: Name of the column to update
+        stamp_hash: Whether to record the document hash (primary model only)
     """
-    for item in embeddings:
-        record_id = item["id"]
-        embedding = item["embedding"]
+    if not embeddings:
+        return
+    async with SessionLocal() as db:
+        # Each record gets its first chunk and the hash of the document it came from
+        values, params = values_clause(
+            [
+                (record_id, vectors[0], embedding_source_hash(records[record_id]["document"]))
+                for record_id, vectors in embeddings.items()
+            ],
+            ["uuid", "vector", "text"],
+        )
+        await db.execute(
+            text(f"""
+                UPDATE records AS r
+                SET {column_name} = v.embedding,
+                    embedding_source_hash = CASE WHEN :stamp_hash THEN v.source_hash ELSE r.embedding_source_hash END,
+                    updated_at = NOW()
+                FROM ({values}) AS v(id, embedding, source_hash)
+                WHERE r.id = v.id
+            """),
+            {**params, "stamp_hash": stamp_hash}
+        )
 
-        # Update the record with the new embedding
-        stmt = (
-            text(f"UPDATE records SET {column_name} = :embedding, updated_at = NOW() WHERE id = :id")
+        # Chunk count only depends on the text, so other models' chunk columns line up
+        values, params = values_clause(
+            [(record_id, len(vectors)) for record_id, vectors in embeddings.items()],
+            ["uuid", "integer"],
+        )
+        await db.execute(
+            text(f"""
+                DELETE FROM record_chunks AS c
+                USING ({values}) AS v(record_id, chunk_count)
+                WHERE c.record_id = v.record_id AND c.chunk_index >= v.chunk_count
+            """),
+            params
         )
-        session.execute(stmt, {"embedding": embedding, "id": record_id})
 
-    session.commit()
+        values, params = values_clause(
+            [
+                (record_id, records[record_id]["user_id"], index, vector)
+                for record_id, vectors in embeddings.items()
+                for index, vector in enumerate(vectors)
+            ],
+            ["uuid", "uuid", "integer", "vector"],
+        )
+        await db.execute(
+            text(f"""
+                INSERT INTO record_chunks (record_id, user_id, chunk_index, {column_name})
+                {values}
+                ON CONFLICT (record_id, chunk_index) DO UPDATE SET {column_name} = EXCLUDED.{column_name}
+            """),
+            params
+        )
+        await db.commit()
+
+
+class Checkpoint:
+    """Tracks pages in read order and persists the last id below which all pages are written."""
+
+    def __init__(self, path: str, column_name: str):
+        self.path = path
+        self.column_name = column_name
+        self.last_id: Optional[UUID] = None
+        self.pages: List[List[Any]] = []  # [last id of page, done]
+
+    def load(self) -> Optional[UUID]:
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("column") == self.column_name and data.get("last_id"):
+                self.last_id = UUID(data["last_id"])
+        return self.last_id
+
+    def started(self, page_last_id: UUID) -> List[Any]:
+        page = [page_last_id, False]
+        self.pages.append(page)
+        return page
+
+    def finished(self, page: List[Any]) -> None:
+        page[1] = True
+        # Advance only over the contiguous prefix of written pages; a failed page holds it back
+        while self.pages and self.pages[0][1]:
+            self.last_id = self.pages.pop(0)[0]
+        with open(self.path, "w") as f:
+            json.dump({"column": self.column_name, "last_id": str(self.last_id) if self.last_id else None}, f)
+
+
+class Progress:
+    def __init__(self, total: int):
+        self.total = total
+        self.scanned = 0
+        self.embedded = 0
+        self.failed = 0
+        self.started_at = time.monotonic()
+
+    def report(self) -> str:
+        elapsed = time.monotonic() - self.started_at
+        rate = self.scanned / elapsed if elapsed else 0.0
+        eta = (self.total - self.scanned) / rate if rate else float("inf")
+        return (
+            f"scanned {self.scanned}/{self.total}, embedded {self.embedded}, failed {self.failed} | "
+            f"{rate:.1f} records/s, ETA {eta:.0f}s"
+        )
 
 
-async def migrate_embeddings():
+async def process_page(rows, model: str, column_name: str) -> Tuple[int, int]:
+    """Embed and store the stale records of one page. Returns (embedded, failed)."""
+    primary = model == settings.embedding_model
+    records = {}
+    for row in rows:
+        document = compose_document(row.name, row.tags, row.notes)
+        # A shadow backfill only fills gaps; changed documents are re-embedded by the worker
+        if row.has_embedding and (not primary or row.embedding_source_hash == embedding_source_hash(document)):
+            continue
+        records[row.id] = {
+            "user_id": row.user_id,
+            "document": document,
+            "chunks": build_chunks(row.name, row.tags, row.notes),
+        }
+    if not records:
+        return 0, 0
+    embeddings = await embed_chunks({record_id: r["chunks"] for record_id, r in records.items()}, model)
+    await update_embeddings_in_db(records, embeddings, column_name, stamp_hash=primary)
+    return len(embeddings), len(records) - len(embeddings)
+
+
+async def migrate_embeddings(model: str, concurrency: int, page_size: int, checkpoint_path: str, reset: bool):
     """
     Main migration function.
     """
-    # Determine the column name based on settings
-    column_name = f"{settings.embedding_model.replace('-','_')}_embedding"
+    column_name = embedding_column_name(model)
 
     print(f"Starting embedding migration to column: {column_name}")
-    print(f"Using model: {settings.embedding_model}")
+    print(f"Using model: {model}")
 
-    # Create database engine and session
-    engine = create_engine(settings.database_url)
-    Session = sessionmaker(bind=engine)
-    session = Session()
+    checkpoint = Checkpoint(checkpoint_path, column_name)
+    if reset and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    after = checkpoint.load()
+    if after:
+        print(f"Resuming after record {after} (checkpoint {checkpoint_path})")
 
     try:
-        # Find all records where the target embedding column is NULL
-        stmt = text(f"""
-            SELECT id, notes 
-            FROM records 
-            WHERE {column_name} IS NULL 
-            AND notes IS NOT NULL 
-            AND notes != ''
-        """)
-
-        result = session.execute(stmt)
-        records_to_process = [
-            {"id": row[0], "text": row[1]}
-            for row in result.fetchall()
-        ]
-
-        total_records = len(records_to_process)
-        print(f"Found {total_records} records to process")
-
-        if total_records == 0:
-            print("No records to migrate. Exiting.")
-            return
-
-        # Process in batches
-        async with httpx.AsyncClient() as client:
-            processed = 0
-
-            for i in range(0, total_records, BATCH_SIZE):
-                batch = records_to_process[i:i + BATCH_SIZE]
-                batch_num = (i // BATCH_SIZE) + 1
-                total_batches = (total_records + BATCH_SIZE - 1) // BATCH_SIZE
-
-                print(f"Processing batch {batch_num}/{total_batches} ({len(batch)} records)...")
-
+        async with SessionLocal() as db:
+            total = await db.scalar(
+                text("SELECT count(*) FROM records WHERE CAST(:after AS uuid) IS NULL OR id > CAST(:after AS uuid)"),
+                {"after": after}
+            )
+        print(f"Found {total} records to scan with {concurrency} concurrent batches")
+        progress = Progress(total)
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                page, rows = item
                 try:
-                    # Get embeddings for this batch
-                    embeddings = await get_embeddings_batch(client, batch)
-
-                    # Update database
-                    update_embeddings_in_db(session, embeddings, column_name)
-
-                    processed += len(batch)
-                    print(f"Successfully processed {processed}/{total_records} records")
-
+                    embedded, failed = await process_page(rows, model, column_name)
+                    progress.embedded += embedded
+                    progress.failed += failed
+                    if not failed:
+                        checkpoint.finished(page)
                 except Exception as e:
-                    print(f"Error processing batch {batch_num}: {e}")
-                    session.rollback()
-                    print("Rolling back batch. Continuing with next batch...")
-                    continue
-
-        print(f"\nMigration complete! Processed {processed}/{total_records} records.")
+                    progress.failed += len(rows)
+                    print(f"Error processing page ending at {page[0]}: {e}. Continuing with next page...")
+                progress.scanned += len(rows)
+                print(progress.report())
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        async for rows in read_pages(column_name, after, page_size):
+            # Bounded queue: reading pauses while `concurrency` pages are waiting
+            await queue.put((checkpoint.started(rows[-1].id), rows))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+        print(f"\nMigration complete! {progress.report()}")
+        if progress.failed:
+            print("Some records failed; re-run to retry them from the checkpoint.")
 
     except Exception as e:
         print(f"Fatal error during migration: {e}")
-        session.rollback()
         sys.exit(1)
     finally:
-        session.close()
-        engine.dispose()
+        await close_http_client()
+        await engine.dispose()
 
 
 def main():
     """Entry point for the migration script."""
+    parser = argparse.ArgumentParser(description="Re-embed records with the configured embedding model")
+    parser.add_argument("--model", default=settings.embedding_model, help="Model to embed with (e.g. the shadow model)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Pages embedded concurrently")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help="Records read per page")
+    parser.add_argument("--checkpoint", default=".migrate_embed_model.checkpoint", help="Checkpoint file path")
+    parser.add_argument("--reset", action="store_true", help="Ignore any existing checkpoint")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("Embedding Migration Script")
     print("=" * 60)
-    asyncio.run(migrate_embeddings())
+    asyncio.run(migrate_embeddings(args.model, args.concurrency, args.page_size, args.checkpoint, args.reset))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,128 @@
+"""
+Report HNSW recall vs latency on one user's chunks for a range of ef_search values.
+
+Queries are sampled from the user's own chunk vectors. Each one is answered
+once exactly (index scans off) and once through the HNSW index per ef_search
+value, using the configured hnsw.iterative_scan; recall@k is the share of the
+exact top-k the index returned. --index compares the float32 index with the
+halfvec and binary-quantized ones (over-fetch, then exact re-rank).
+
+Usage:
+    docker exec -it peoplepad-backend python -m scripts.tune_hnsw --user-id <uuid> [--ef-search 40,100,200,400] [--index vector,halfvec,binary]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List, Set
+from uuid import UUID
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.services.embedding import embedding_column_name
+from app.services.search_plan import apply_hnsw_settings
+
+
+def approximate_order(column_name: str, index: str) -> str:
+    """ORDER BY expression served by the given index; must match the index expressions."""
+    if index == "halfvec":
+        return f"{column_name}::halfvec(768) <=> CAST(:query AS vector)::halfvec(768)"
+    if index == "binary":
+        return f"binary_quantize({column_name})::bit(768) <~> binary_quantize(CAST(:query AS vector))"
+    return f"{column_name} <=> CAST(:query AS vector)"
+
+
+async def nearest(db: AsyncSession, column_name: str, user_id: UUID, query, k: int, index: str = "vector") -> Set[UUID]:
+    if index == "vector":
+        shortlist = ""
+    else:
+        # Over-fetch on the quantized index, then re-rank on the full vectors
+        shortlist = f"""AND id IN (
+            SELECT id FROM record_chunks
+            WHERE user_id = :user_id AND {column_name} IS NOT NULL
+            ORDER BY {approximate_order(column_name, index)}
+            LIMIT :shortlist
+        )"""
+    rows = await db.execute(
+        text(f"""
+            SELECT id FROM record_chunks
+            WHERE user_id = :user_id AND {column_name} IS NOT NULL {shortlist}
+            ORDER BY {column_name} <=> CAST(:query AS vector)
+            LIMIT :k
+        """),
+        {"user_id": user_id, "query": query, "k": k, "shortlist": k * settings.quantized_rerank_factor}
+    )
+    return {row.id for row in rows}
+
+
+async def tune(user_id: UUID, model: str, ef_values: List[int], indexes: List[str], queries: int, k: int):
+    column_name = embedding_column_name(model)
+    try:
+        async with SessionLocal() as db:
+            samples = (await db.execute(
+                text(f"""
+                    SELECT {column_name} AS embedding FROM record_chunks
+                    WHERE user_id = :user_id AND {column_name} IS NOT NULL
+                    ORDER BY random()
+                    LIMIT :queries
+                """),
+                {"user_id": user_id, "queries": queries}
+            )).scalars().all()
+            chunks = await db.scalar(
+                text("SELECT count(*) FROM record_chunks WHERE user_id = :user_id"), {"user_id": user_id}
+            )
+        if not samples:
+            print(f"User {user_id} has no {column_name} chunks")
+            return
+        print(f"{len(samples)} queries over {chunks} chunks, k={k}, iterative_scan={settings.hnsw_iterative_scan}")
+
+        exact = []
+        exact_latencies = []
+        for query in samples:
+            async with SessionLocal() as db:
+                await db.execute(text("SET LOCAL enable_indexscan = off"))
+                started = time.perf_counter()
+                exact.append(await nearest(db, column_name, user_id, query, k))
+                exact_latencies.append(time.perf_counter() - started)
+        print(f"{'exact':>18} | recall@{k} 1.000 | mean {statistics.mean(exact_latencies) * 1000:7.2f}ms")
+
+        for index in indexes:
+            for ef_search in ef_values:
+                recalls = []
+                latencies = []
+                for query, expected in zip(samples, exact):
+                    async with SessionLocal() as db:
+                        await apply_hnsw_settings(db, ef_search)
+                        started = time.perf_counter()
+                        found = await nearest(db, column_name, user_id, query, k, index)
+                        latencies.append(time.perf_counter() - started)
+                    recalls.append(len(found & expected) / len(expected) if expected else 1.0)
+                latencies.sort()
+                print(
+                    f"{index + ' ef=' + str(ef_search):>18} | recall@{k} {statistics.mean(recalls):.3f} | "
+                    f"mean {statistics.mean(latencies) * 1000:7.2f}ms, "
+                    f"p95 {latencies[int(0.95 * (len(latencies) - 1))] * 1000:7.2f}ms"
+                )
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure HNSW recall vs latency for a user's chunks")
+    parser.add_argument("--user-id", type=UUID, required=True, help="User whose chunks are searched")
+    parser.add_argument("--model", default=settings.embedding_model, help="Model whose vectors are searched")
+    parser.add_argument("--ef-search", default="40,100,200,400", help="Comma-separated ef_search values")
+    parser.add_argument("--index", default="vector", help="Comma-separated indexes: vector, halfvec, binary")
+    parser.add_argument("--queries", type=int, default=50, help="Number of sampled query vectors")
+    parser.add_argument("-k", type=int, default=10, help="Neighbours compared per query")
+    args = parser.parse_args()
+    ef_values = [int(value) for value in args.ef_search.split(",")]
+    indexes = args.index.split(",")
+    asyncio.run(tune(args.user_id, args.model, ef_values, indexes, args.queries, args.k))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import os
+
+# Settings are required at import time; tests never reach these services
+for name, value in {
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "POSTGRES_DB": "test",
+    "GOOGLE_CLIENT_ID": "test-client-id",
+    "GOOGLE_CLIENT_SECRET": "test",
+    "GOOGLE_AUTH_URL": "http://google.test/auth",
+    "GOOGLE_TOKEN_URL": "http://google.test/token",
+    "GOOGLE_REDIRECT_URI": "http://localhost/auth/callback",
+    "OPENAI_KEY": "test",
+    "EMBEDDING_SERVICE_KEY": "test",
+    "MAX_EMBEDDING_RETRIES": "1",
+    "EMBEDDING_RETRY_DELAY": "0",
+    "EMBEDDING_MODEL": "all-mpnet-base-v2",
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,102 @@
+import asyncio
+import datetime
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt
+from google.auth import jwt as google_jwt
+
+from app.main import app
+from app.services import google_auth
+from app.services.google_auth import CertificateCache, verify_id_token
+
+CERTS_URL = "http://google.test/certs"
+
+
+def make_key(key_id: str):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, key_id)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    pem_key = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    signer = crypt.RSASigner.from_string(pem_key, key_id)
+    return signer, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+OLD_SIGNER, OLD_CERT = make_key("old")
+NEW_SIGNER, NEW_CERT = make_key("new")
+
+
+def id_token(signer, audience: str = "test-client-id") -> str:
+    now = int(time.time())
+    payload = {
+        "iss": "https://accounts.google.com",
+        "aud": audience,
+        "sub": "1234",
+        "email": "jane@example.com",
+        "iat": now,
+        "exp": now + 600,
+    }
+    return google_jwt.encode(signer, payload).decode()
+
+
+@pytest.fixture
+def cert_endpoint(monkeypatch):
+    """Stand-in for Google's certificate endpoint; set `served` to rotate keys."""
+    endpoint = {"served": {"old": OLD_CERT}, "fetches": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        endpoint["fetches"] += 1
+        return httpx.Response(200, json=endpoint["served"], headers={"cache-control": "public, max-age=3600"})
+
+    monkeypatch.setattr(google_auth, "google_certs", CertificateCache(CERTS_URL))
+    monkeypatch.setattr(google_auth, "get_http_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return endpoint
+
+
+def test_verify_id_token_uses_cached_certs(cert_endpoint):
+    async def verify_twice():
+        await verify_id_token(id_token(OLD_SIGNER))
+        return await verify_id_token(id_token(OLD_SIGNER))
+
+    assert asyncio.run(verify_twice())["email"] == "jane@example.com"
+    assert cert_endpoint["fetches"] == 1
+
+
+def test_verify_id_token_refetches_for_unknown_key_id(cert_endpoint):
+    async def verify_after_rotation():
+        await verify_id_token(id_token(OLD_SIGNER))
+        cert_endpoint["served"] = {"old": OLD_CERT, "new": NEW_CERT}
+        return await verify_id_token(id_token(NEW_SIGNER))
+
+    assert asyncio.run(verify_after_rotation())["sub"] == "1234"
+    assert cert_endpoint["fetches"] == 2
+
+
+def test_verify_id_token_does_not_refetch_for_invalid_token(cert_endpoint):
+    with pytest.raises(ValueError):
+        asyncio.run(verify_id_token(id_token(OLD_SIGNER, audience="someone-else")))
+    assert cert_endpoint["fetches"] == 1
+
+
+@pytest.mark.parametrize("path", ["/stats/embedding-cache", "/stats/embedding-queue", "/stats/embedding-backfill"])
+def test_stats_require_authentication(path):
+    # HTTPBearer rejects a missing Authorization header with 403
+    assert TestClient(app).get(path).status_code == 403
@@ -0,0 +1,72 @@
+import asyncio
+import uuid
+
+import numpy as np
+import pytest
+from pgvector import Vector as PgVector
+from pgvector.asyncpg import register_vector
+from sqlalchemy import literal, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import Vector
+from app.models.query_embedding import QueryEmbedding
+from app.models.record_chunk import EMBEDDING_DIMENSIONS, RecordChunk
+
+
+class CodecRecorder:
+    """Stands in for an asyncpg connection and keeps the codecs register_vector sets."""
+
+    def __init__(self):
+        self.codecs = {}
+
+    async def set_type_codec(self, typename, **kwargs):
+        self.codecs[typename] = kwargs
+
+
+@pytest.fixture(scope="module")
+def vector_codec():
+    connection = CodecRecorder()
+    asyncio.run(register_vector(connection))
+    return connection.codecs["vector"]
+
+
+def bound_vectors(statement):
+    """Bind parameter values as the asyncpg dialect hands them to the driver."""
+    dialect = postgresql.asyncpg.dialect()
+    compiled = statement.compile(dialect=dialect)
+    processors = compiled._bind_processors
+    return {
+        name: processors[name](value) if name in processors else value
+        for name, value in compiled.params.items()
+        if isinstance(compiled.binds[name].type, Vector)
+    }
+
+
+@pytest.mark.parametrize("value", [
+    np.linspace(-1, 1, EMBEDDING_DIMENSIONS, dtype=np.float32),
+    np.linspace(-1, 1, EMBEDDING_DIMENSIONS).tolist(),
+])
+def test_vector_binds_encode_through_the_asyncpg_codec(vector_codec, value):
+    expected = PgVector(np.asarray(value, dtype=np.float32)).to_binary()
+    statements = [
+        insert(RecordChunk).values(
+            record_id=uuid.uuid4(), user_id=uuid.uuid4(), chunk_index=0, all_mpnet_base_v2_embedding=value
+        ),
+        insert(QueryEmbedding).values(model="m", text_hash="h", embedding=value),
+        select(RecordChunk.id).order_by(
+            RecordChunk.all_mpnet_base_v2_embedding.cosine_distance(literal(value, Vector(EMBEDDING_DIMENSIONS)))
+        ),
+    ]
+    for statement in statements:
+        binds = bound_vectors(statement)
+        assert len(binds) == 1
+        assert [vector_codec["encoder"](bound) for bound in binds.values()] == [expected]
+
+
+def test_vector_results_decode_to_float32_arrays(vector_codec):
+    value = np.linspace(-1, 1, EMBEDDING_DIMENSIONS, dtype=np.float32)
+    decoded = vector_codec["decoder"](PgVector(value).to_binary())
+    result = Vector(EMBEDDING_DIMENSIONS).result_processor(postgresql.asyncpg.dialect(), None)(decoded)
+    assert result.dtype == np.float32
+    np.testing.assert_array_equal(result, value)
@@ -0,0 +1,51 @@
+import pytest
+
+from app.services import documents
+from app.services.documents import build_chunks, compose_document, split_text
+
+NOTES = " ".join(f"word{i}" for i in range(400))
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(documents.settings, "embedding_chunk_size", 200)
+    monkeypatch.setattr(documents.settings, "embedding_chunk_overlap", 40)
+
+
+def test_split_text_windows_overlap_and_cut_at_whitespace():
+    chunks = split_text(NOTES, 200, 40)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    # No word is cut in half, and consecutive windows share some words
+    words = set(NOTES.split())
+    assert all(set(chunk.split()) <= words for chunk in chunks)
+    assert all(set(a.split()) & set(b.split()) for a, b in zip(chunks, chunks[1:]))
+    assert chunks[0].startswith("word0 ") and chunks[-1].endswith("word399")
+
+
+def test_split_text_handles_empty_and_unbroken_text():
+    assert split_text("", 200, 40) == []
+    assert split_text("   ", 200, 40) == []
+    chunks = split_text("x" * 500, 200, 40)
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert "".join(chunks).count("x") >= 500
+
+
+def test_build_chunks_keeps_short_documents_whole():
+    assert build_chunks("Jane Roe", ["b", "a"], "Met at PyCon") == [compose_document("Jane Roe", ["a", "b"], "Met at PyCon")]
+
+
+def test_build_chunks_prefixes_note_windows_with_the_header():
+    chunks = build_chunks("Jane Roe", ["python"], NOTES)
+    assert len(chunks) > 1
+    assert all(chunk.startswith("Jane Roe\nTags: python\n") for chunk in chunks)
+    assert all(len(chunk) <= 200 for chunk in chunks)
+
+
+@pytest.mark.parametrize("notes", [None, "", "short note"])
+def test_build_chunks_with_oversized_header_windows_the_document(notes):
+    tags = [f"tag{i}" for i in range(80)]
+    chunks = build_chunks("Jane Roe", tags, notes)
+    assert chunks
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert chunks[0].startswith("Jane Roe\nTags: ")
@@ -0,0 +1,166 @@
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+from app.services import embedding
+from app.services.embedding import EmbeddingCache, embedding_cache, generate_cache_key, get_embedding, warm_embedding
+from app.services.embedding_store import EmbeddingStore
+
+
+def vector(value: float, dimensions: int = 4) -> list:
+    return [value] * dimensions
+
+
+def test_cache_evicts_least_recently_used_entry():
+    cache = EmbeddingCache(max_entries=2, max_bytes=10_000)
+    cache.set("a", vector(1))
+    cache.set("b", vector(2))
+    assert cache.get("a") is not None  # "b" is now the least recently used
+    cache.set("c", vector(3))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_stays_within_byte_budget():
+    entry_size = 4 * 4 + 1  # four float32s plus the one-character key
+    cache = EmbeddingCache(max_entries=100, max_bytes=3 * entry_size)
+    for key in "abcde":
+        cache.set(key, vector(1.0))
+    stats = cache.stats()
+    assert stats["entries"] == 3 and stats["bytes"] == 3 * entry_size
+    assert [cache.get(key) is not None for key in "abcde"] == [False, False, True, True, True]
+    # A single entry over the budget is not cached at all
+    cache.set("big", vector(1.0, dimensions=100))
+    assert cache.get("big") is None and cache.stats()["entries"] == 3
+
+
+def test_cache_replacing_a_key_keeps_byte_count():
+    cache = EmbeddingCache(max_entries=10, max_bytes=10_000)
+    cache.set("a", vector(1))
+    cache.set("a", vector(2))
+    assert cache.stats()["entries"] == 1 and cache.stats()["bytes"] == 4 * 4 + 1
+    np.testing.assert_array_equal(cache.get("a"), vector(2))
+
+
+def test_cache_expires_entries_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embedding.time, "monotonic", lambda: now[0])
+    cache = EmbeddingCache(max_entries=10, max_bytes=10_000, ttl_seconds=60)
+    cache.set("a", vector(1))
+    now[0] += 59
+    assert cache.get("a") is not None
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+
+def test_cache_stats_count_hits_misses_and_expirations(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(embedding.time, "monotonic", lambda: now[0])
+    cache = EmbeddingCache(max_entries=10, max_bytes=10_000, ttl_seconds=10)
+    cache.set("a", vector(1))
+    cache.get("a")
+    cache.get("a")
+    cache.get("missing")
+    now[0] = 11
+    cache.get("a")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"], stats["evictions"]) == (2, 2, 1, 0)
+
+
+def test_cached_vectors_are_read_only_float32():
+    cache = EmbeddingCache(max_entries=10, max_bytes=10_000)
+    cache.set("a", [0.1, 0.2])
+    value = cache.get("a")
+    assert value.dtype == np.float32
+    with pytest.raises(ValueError):
+        value[0] = 1.0
+
+
+class FailingStore(EmbeddingStore):
+    async def get(self, model, text_hash):
+        raise AssertionError("warm-ups must not read the shared store")
+
+    async def set(self, model, text_hash, embedding):
+        raise AssertionError("warm-ups must not write the shared store")
+
+
+@pytest.fixture
+def embedding_service(monkeypatch):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json={"data": [{"embedding": [0.5] * 4}]})
+
+    monkeypatch.setattr(embedding.settings, "embedding_encoding_format", "float")
+    monkeypatch.setattr(embedding, "embedding_store", FailingStore())
+    monkeypatch.setattr(embedding, "get_http_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    embedding_cache.clear()
+    yield calls
+    embedding_cache.clear()
+
+
+def test_warm_embedding_fills_only_the_process_cache(embedding_service):
+    async def warm_twice():
+        await asyncio.gather(warm_embedding("machine learning"), warm_embedding("machine learning"))
+        await warm_embedding("machine learning")
+
+    asyncio.run(warm_twice())
+    assert len(embedding_service) == 1
+    np.testing.assert_array_equal(embedding_cache.get(generate_cache_key("machine learning")), [0.5] * 4)
+
+
+@pytest.fixture
+def gated_embedding_service(monkeypatch):
+    """Embedding service stand-in whose responses wait until the test opens the gate."""
+    service = {"calls": 0, "gate": None}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        service["calls"] += 1
+        await service["gate"].wait()
+        return httpx.Response(200, json={"data": [{"embedding": [0.25] * 4}]})
+
+    monkeypatch.setattr(embedding.settings, "embedding_encoding_format", "float")
+    monkeypatch.setattr(embedding, "embedding_store", EmbeddingStore())
+    monkeypatch.setattr(embedding, "get_http_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    embedding_cache.clear()
+    yield service
+    embedding_cache.clear()
+
+
+def test_concurrent_identical_misses_share_one_request(gated_embedding_service):
+    async def search_concurrently():
+        gated_embedding_service["gate"] = asyncio.Event()
+        waiters = [asyncio.create_task(get_embedding("john doe")) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        gated_embedding_service["gate"].set()
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(search_concurrently())
+    assert gated_embedding_service["calls"] == 1
+    for result in results:
+        np.testing.assert_array_equal(result, [0.25] * 4)
+    assert not embedding._inflight
+
+
+def test_cancelled_waiter_does_not_fail_the_others(gated_embedding_service):
+    async def cancel_one():
+        gated_embedding_service["gate"] = asyncio.Event()
+        cancelled = asyncio.create_task(get_embedding("jane roe"))
+        others = [asyncio.create_task(get_embedding("jane roe")) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        gated_embedding_service["gate"].set()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await asyncio.gather(*others)
+
+    results = asyncio.run(cancel_one())
+    assert gated_embedding_service["calls"] == 1
+    assert len(results) == 2
+    np.testing.assert_array_equal(embedding_cache.get(generate_cache_key("jane roe")), [0.25] * 4)
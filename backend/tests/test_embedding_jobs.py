@@ -0,0 +1,119 @@
+import asyncio
+from types import SimpleNamespace
+from uuid import uuid4
+
+import httpx
+import pytest
+from tenacity import RetryError, Future
+
+from app.tasks import embeddings
+from app.services.embedding import embedding_column_name
+from app.tasks.embeddings import _embed_records, process_embedding_jobs
+
+
+def rejected(status: int = 400) -> RetryError:
+    """What request_embeddings_batch raises once tenacity gives up on a response."""
+    request = httpx.Request("POST", "http://embedding-service/embed/batch")
+    error = httpx.HTTPStatusError("rejected", request=request, response=httpx.Response(status, request=request))
+    attempt = Future(1)
+    attempt.set_exception(error)
+    return RetryError(attempt)
+
+
+def test_embed_records_fails_only_the_rejected_record(monkeypatch):
+    bad = uuid4()
+    chunks = {uuid4(): ["fine"] for _ in range(7)}
+    chunks[bad] = ["far too long"]
+    calls = []
+
+    async def embed_chunks(batch, model):
+        calls.append(len(batch))
+        if bad in batch:
+            raise rejected()
+        return {record_id: [[0.0]] for record_id in batch}
+
+    monkeypatch.setattr(embeddings, "embed_chunks", embed_chunks)
+    embedded, errors = asyncio.run(_embed_records(chunks, "model"))
+    assert set(embedded) == set(chunks) - {bad}
+    assert list(errors) == [bad]
+    # Bisected rather than retried record by record
+    assert len(calls) < len(chunks) + 1
+
+
+def test_embed_records_propagates_unavailability(monkeypatch):
+    async def embed_chunks(batch, model):
+        raise rejected(503)
+
+    monkeypatch.setattr(embeddings, "embed_chunks", embed_chunks)
+    with pytest.raises(RetryError):
+        asyncio.run(_embed_records({uuid4(): ["text"], uuid4(): ["text"]}, "model"))
+
+
+class FakeSession:
+    def __init__(self, claimed):
+        self.claimed = claimed
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def execute(self, statement, *args):
+        claimed, self.claimed = self.claimed, []
+        return SimpleNamespace(all=lambda: claimed)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def test_failures_after_the_claim_count_as_attempts(monkeypatch):
+    jobs = [SimpleNamespace(id=index, record_id=uuid4()) for index in range(3)]
+    row = SimpleNamespace(name="Jane", notes=None, has_embedding=False, embedding_source_hash=None)
+    failed = []
+
+    async def load_documents(db, record_ids):
+        return {record_id: (row, [], "Jane") for record_id in record_ids}
+
+    async def embed_and_store(db, jobs, documents):
+        raise RuntimeError("store failed")
+
+    async def fail_jobs(db, job_ids, error):
+        failed.append((job_ids, error))
+
+    monkeypatch.setattr(embeddings, "_load_documents", load_documents)
+    monkeypatch.setattr(embeddings, "_embed_and_store", embed_and_store)
+    monkeypatch.setattr(embeddings, "_fail_jobs", fail_jobs)
+    db = FakeSession(jobs)
+    assert asyncio.run(process_embedding_jobs(db, 10)) == 3
+    assert failed == [([0, 1, 2], "store failed")]
+    assert db.rollbacks == 1 and db.commits == 2
+
+
+class RecordingSession:
+    def __init__(self):
+        self.executed = []
+
+    async def execute(self, statement, params=None):
+        self.executed.append((statement, params))
+
+
+def test_store_clears_shadow_vectors_the_shadow_model_missed(monkeypatch):
+    monkeypatch.setattr(embeddings.settings, "embedding_shadow_model", "shadow-model")
+    primary_column = embedding_column_name(embeddings.settings.embedding_model)
+    shadow_column = embedding_column_name("shadow-model")
+    both, primary_only = uuid4(), uuid4()
+    db = RecordingSession()
+    asyncio.run(embeddings.store_chunk_embeddings(
+        db,
+        {both: (uuid4(), "Jane"), primary_only: (uuid4(), "John")},
+        {
+            embeddings.settings.embedding_model: {both: [[1.0]], primary_only: [[2.0]]},
+            "shadow-model": {both: [[3.0]]},
+        },
+    ))
+    _, chunk_rows = db.executed[1]
+    _, record_rows = db.executed[2]
+    for rows, key in ((chunk_rows, "record_id"), (record_rows, "id")):
+        by_record = {row[key]: row for row in rows}
+        assert by_record[both][primary_column] == [1.0] and by_record[both][shadow_column] == [3.0]
+        assert by_record[primary_only][primary_column] == [2.0] and by_record[primary_only][shadow_column] is None
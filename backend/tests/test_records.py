@@ -0,0 +1,126 @@
+import asyncio
+import json
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import records
+from app.services.record_import import iter_csv_rows, iter_ndjson_rows
+from app.utils.security import get_current_user
+
+USER_ID = uuid4()
+
+CSV_BODY = (
+    "name,notes,tags\n"
+    "Jane Roe,Met at PyCon,conference;python\n"
+    '"John Doe","Works in AI\nlikes hiking",ai\n'
+    "Ann Lee,,\n"
+)
+
+NDJSON_BODY = "\n".join(
+    json.dumps({"name": f"Person {i}", "notes": f"note {i}", "tags": ["imported"]}) for i in range(2500)
+) + "\n"
+
+
+async def collect(rows):
+    return [row async for row in rows]
+
+
+async def chunks(body: bytes, size: int = 7):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def test_iter_csv_rows_handles_quoted_newlines_and_tags():
+    rows = asyncio.run(collect(iter_csv_rows(chunks(CSV_BODY.encode()))))
+    assert [row for _, row in rows] == [
+        {"name": "Jane Roe", "notes": "Met at PyCon", "tags": ["conference", "python"]},
+        {"name": "John Doe", "notes": "Works in AI\nlikes hiking", "tags": ["ai"]},
+        {"name": "Ann Lee", "notes": None, "tags": []},
+    ]
+
+
+def test_iter_ndjson_rows_skips_blank_lines():
+    body = b'{"name": "A"}\n\n{"name": "B"}\r\n'
+    rows = asyncio.run(collect(iter_ndjson_rows(chunks(body))))
+    assert rows == [(1, {"name": "A"}), (3, {"name": "B"})]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    inserted = []
+
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    async def fake_insert_records(db, user_id, chunk):
+        assert user_id == USER_ID
+        inserted.extend(chunk)
+        return [uuid4() for _ in chunk]
+
+    monkeypatch.setattr(records, "SessionLocal", FakeSession)
+    monkeypatch.setattr(records, "insert_records", fake_insert_records)
+    app.dependency_overrides[get_current_user] = lambda: USER_ID
+    yield TestClient(app), inserted
+    app.dependency_overrides.clear()
+
+
+def import_summary(response):
+    assert response.status_code == 200
+    return json.loads(response.text.strip().splitlines()[-1])
+
+
+def test_import_csv(client):
+    test_client, inserted = client
+    response = test_client.post("/records/import", content=CSV_BODY, headers={"Content-Type": "text/csv"})
+    summary = import_summary(response)
+    assert summary == {"done": True, "imported": 3, "errors": []}
+    assert [record.name for record in inserted] == ["Jane Roe", "John Doe", "Ann Lee"]
+
+
+def test_import_ndjson(client):
+    test_client, inserted = client
+    response = test_client.post(
+        "/records/import", content=NDJSON_BODY, headers={"Content-Type": "application/x-ndjson"}
+    )
+    summary = import_summary(response)
+    assert summary == {"done": True, "imported": 2500, "errors": []}
+    assert len(inserted) == 2500
+
+
+def test_import_reports_invalid_rows(client):
+    test_client, _ = client
+    body = '{"name": "Valid"}\n{"notes": "no name"}\n'
+    response = test_client.post("/records/import", content=body, headers={"Content-Type": "application/x-ndjson"})
+    summary = import_summary(response)
+    assert summary["imported"] == 1
+    assert [error["line"] for error in summary["errors"]] == [2]
+
+
+def test_import_rejects_unknown_content_type(client):
+    test_client, _ = client
+    response = test_client.post("/records/import", content="x", headers={"Content-Type": "text/plain"})
+    assert response.status_code == 415
+
+
+def test_import_rejects_oversized_upload(client, monkeypatch):
+    test_client, inserted = client
+    monkeypatch.setattr(records.settings, "bulk_import_max_upload_size", 1000)
+    headers = {"Content-Type": "application/x-ndjson"}
+    response = test_client.post("/records/import", content=NDJSON_BODY, headers=headers)
+    assert response.status_code == 413
+
+    # Without a Content-Length the cap is enforced while spooling
+    def body():
+        for start in range(0, len(NDJSON_BODY), 100):
+            yield NDJSON_BODY[start:start + 100].encode()
+
+    response = test_client.post("/records/import", content=body(), headers=headers)
+    assert response.status_code == 413
+    assert inserted == []
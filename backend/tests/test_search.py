@@ -0,0 +1,28 @@
+import base64
+import json
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from app.routers.search import decode_cursor, encode_cursor
+from app.schemas.search import SearchCursor
+
+
+def cursor_value(**overrides) -> str:
+    fields = {"session": "s", "query_hash": "q", "mode": "hybrid", "distance": None, "id": str(uuid4()), "depth": 3}
+    fields.update(overrides)
+    return base64.urlsafe_b64encode(json.dumps(fields).encode()).decode()
+
+
+def test_cursor_round_trip():
+    cursor = SearchCursor(session="s", query_hash="q", mode="semantic", distance=0.25, id=uuid4(), depth=6)
+    assert decode_cursor(encode_cursor(cursor)) == cursor
+
+
+@pytest.mark.parametrize("overrides", [{"mode": "bogus"}, {"depth": -1}, {"depth": 10**9}])
+def test_tampered_cursor_is_rejected(overrides):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor_value(**overrides))
+    assert exc.value.status_code == 400
+    assert exc.value.detail == "Invalid cursor"
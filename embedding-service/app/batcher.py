@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+import numpy as np
+from .inference import InferencePool, SaturatedError
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """Merges concurrent single-text requests into one model.encode call.
+
+    Requests are queued; the worker takes the first one, then keeps collecting
+    until max_batch_size items are waiting or max_wait_ms has passed, encodes
+    the whole batch on the inference pool and resolves each caller's future.
+    Once max_queue_size texts are waiting, new requests get SaturatedError.
+    """
+
+    def __init__(self, encode: Callable[[list[str]], np.ndarray], pool: InferencePool,
+                 max_batch_size: int, max_wait_ms: float, max_queue_size: int):
+        self.encode = encode
+        self.pool = pool
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.worker: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.worker is None:
+            self.worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+
+    async def embed(self, text: str) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((text, future))
+        except asyncio.QueueFull:
+            raise SaturatedError(f"{self.queue.qsize()} texts queued for encoding")
+        return await future
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Callers that gave up (client disconnect, timeout) don't need encoding
+        return [(text, future) for text, future in batch if not future.done()]
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = await self.pool.run(self.encode, texts)
+            except Exception as e:
+                logger.error(f"Batch encode of {len(texts)} texts failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            logger.debug(f"Encoded micro-batch of {len(texts)} texts")
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
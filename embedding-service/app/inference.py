@@ -0,0 +1,38 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class SaturatedError(Exception):
+    """Raised when inference work is rejected because the queue is full."""
+
+
+class InferencePool:
+    """Runs model inference in a dedicated thread pool so the event loop stays free.
+
+    `run` always schedules the call; `submit` first checks the number of
+    pending jobs and raises SaturatedError once max_pending is reached.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self.max_pending = max_pending
+        self.pending = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def submit(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.max_pending:
+            raise SaturatedError(f"{self.pending} inference jobs pending")
+        return await self.run(fn, *args)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
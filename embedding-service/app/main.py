@@ -1,9 +1,14 @@
+import base64
 import logging
-from fastapi import FastAPI, Depends, HTTPException
+from contextlib import asynccontextmanager
+import numpy as np
+from fastapi import FastAPI, Depends, HTTPException, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sentence_transformers import SentenceTransformer, __version__
 from .settings import Settings
 from .schemas import EmbedRequest, BatchRequest
+from .batcher import EmbeddingBatcher
+from .inference import InferencePool, SaturatedError
 
 logging.basicConfig(
     level=logging.INFO,
@@ -13,6 +18,11 @@ logging.basicConfig(
 
 settings = Settings()
 
+if settings.torch_num_threads:
+    import torch
+    # Intra-op threads per encode call; keep inference_workers * torch_num_threads <= cores
+    torch.set_num_threads(settings.torch_num_threads)
+
 try:
     model = SentenceTransformer(settings.embedding_model_name, cache_folder=settings.embedding_model_path)
     # Pre-warm the model
@@ -23,7 +33,26 @@ except Exception as e:
 
 dimension = model.get_sentence_embedding_dimension()
 
-app = FastAPI()
+def encode_texts(texts: list[str]):
+    return model.encode(texts, normalize_embeddings=True, batch_size=settings.encode_batch_size)
+
+inference_pool = InferencePool(settings.inference_workers, settings.max_pending_batches)
+batcher = EmbeddingBatcher(
+    encode_texts,
+    inference_pool,
+    settings.batch_max_size,
+    settings.batch_max_wait_ms,
+    settings.max_queue_size,
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    batcher.start()
+    yield
+    await batcher.stop()
+    inference_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 security = HTTPBearer()
 
@@ -32,23 +61,45 @@ async def authenticate(credentials: HTTPAuthorizationCredentials = Depends(secur
         raise HTTPException(status_code=401, detail="Invalid API key")
     return True
 
+# "base64" is little-endian float32 (OpenAI-compatible); "binary" returns raw
+# float32 bytes as application/octet-stream and is only available on /embed
+ENCODING_FORMATS = {"float", "base64", "binary"}
+
+def format_embedding(embedding: np.ndarray, encoding_format: str):
+    if encoding_format == "float":
+        return embedding.tolist()
+    return base64.b64encode(np.asarray(embedding, dtype="<f4").tobytes()).decode("ascii")
+
+def saturated(e: SaturatedError) -> HTTPException:
+    logging.warning(f"Rejecting request, inference saturated: {e}")
+    return HTTPException(503, detail="Embedding service busy, retry later", headers={"Retry-After": "1"})
+
 @app.post("/embed")
 async def embed(request: EmbedRequest, auth: bool = Depends(authenticate)):
     if request.model != settings.embedding_model_name:
         raise HTTPException(400, detail="Unsupported model")
-    if request.encoding_format != "float":
+    if request.encoding_format not in ENCODING_FORMATS:
         raise HTTPException(400, detail="Unsupported encoding format")
     if len(request.input) > settings.max_input_length:
         raise HTTPException(400, detail=f"Input too long, max {settings.max_input_length}")
-    embedding = model.encode(request.input, normalize_embeddings=True).tolist()
-    data = [{"object": "embedding", "embedding": embedding, "index": 0}]
+    try:
+        embedding = await batcher.embed(request.input)
+    except SaturatedError as e:
+        raise saturated(e)
+    if request.encoding_format == "binary":
+        return Response(
+            content=np.asarray(embedding, dtype="<f4").tobytes(),
+            media_type="application/octet-stream",
+            headers={"X-Embedding-Model": settings.embedding_model_name},
+        )
+    data = [{"object": "embedding", "embedding": format_embedding(embedding, request.encoding_format), "index": 0}]
     return {"object": "list", "model": settings.embedding_model_name, "data": data}
 
 @app.post("/embed/batch")
 async def embed_batch(request: BatchRequest, auth: bool = Depends(authenticate)):
     if request.model != settings.embedding_model_name:
         raise HTTPException(400, detail="Unsupported model")
-    if request.encoding_format != "float":
+    if request.encoding_format not in ENCODING_FORMATS - {"binary"}:
         raise HTTPException(400, detail="Unsupported encoding format")
     if len(request.inputs) > 100:  # Arbitrary limit to prevent potential OOM; adjust as needed
         raise HTTPException(413, detail="Batch too large, please split into smaller batches")
@@ -59,10 +110,13 @@ async def embed_batch(request: BatchRequest, auth: bool = Depends(authenticate))
             raise HTTPException(400, detail=f"Input too long for id {inp.id}, max {settings.max_input_length}")
         texts.append(inp.text)
         ids.append(inp.id)
-    embeddings = model.encode(texts, normalize_embeddings=True, batch_size=8)
+    try:
+        embeddings = await inference_pool.submit(lambda: model.encode(texts, normalize_embeddings=True, batch_size=settings.encode_batch_size))
+    except SaturatedError as e:
+        raise saturated(e)
     data = []
     for i, emb in enumerate(embeddings):
-        data.append({"id": ids[i], "object": "embedding", "embedding": emb.tolist()})
+        data.append({"id": ids[i], "object": "embedding", "embedding": format_embedding(emb, request.encoding_format)})
     return {"object": "list", "model": settings.embedding_model_name, "data": data}
 
 @app.get("/health")
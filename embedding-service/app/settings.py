@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -5,5 +6,14 @@ class Settings(BaseSettings):
     peoplepad_client_key: str
     embedding_model_name: str
     embedding_model_path: str
+    # Micro-batching of concurrent /embed calls
+    batch_max_size: int = 32
+    batch_max_wait_ms: float = 5.0
+    encode_batch_size: int = 32
+    # Inference executor and backpressure
+    inference_workers: int = 1
+    torch_num_threads: Optional[int] = None
+    max_queue_size: int = 256
+    max_pending_batches: int = 4
 
     model_config = SettingsConfigDict(env_file='.env', env_ignore_empty=True)
\ No newline at end of file
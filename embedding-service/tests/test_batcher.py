@@ -0,0 +1,102 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.batcher import EmbeddingBatcher
+from app.inference import InferencePool, SaturatedError
+
+
+class RecordingEncoder:
+    """Encodes each text as [len(text)] and remembers the batches it was given."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return np.array([[float(len(text))] for text in texts])
+
+
+@pytest.fixture
+def pool():
+    pool = InferencePool(workers=1, max_pending=10)
+    yield pool
+    pool.shutdown()
+
+
+def run_with_batcher(pool, encoder, scenario, **options):
+    async def main():
+        settings = {"max_batch_size": 4, "max_wait_ms": 20, "max_queue_size": 100, **options}
+        batcher = EmbeddingBatcher(encoder, pool, **settings)
+        batcher.start()
+        try:
+            return await scenario(batcher)
+        finally:
+            await batcher.stop()
+
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_are_merged_and_results_fanned_out(pool):
+    encoder = RecordingEncoder()
+    texts = ["a", "bb", "ccc"]
+
+    async def scenario(batcher):
+        return await asyncio.gather(*(batcher.embed(text) for text in texts))
+
+    results = run_with_batcher(pool, encoder, scenario)
+    assert encoder.batches == [texts]
+    assert [result.tolist() for result in results] == [[1.0], [2.0], [3.0]]
+
+
+def test_batches_are_cut_at_max_batch_size(pool):
+    encoder = RecordingEncoder()
+
+    async def scenario(batcher):
+        return await asyncio.gather(*(batcher.embed("x" * n) for n in range(1, 11)))
+
+    results = run_with_batcher(pool, encoder, scenario, max_batch_size=4, max_wait_ms=1000)
+    assert [len(batch) for batch in encoder.batches] == [4, 4, 2]
+    assert [result.tolist() for result in results] == [[float(n)] for n in range(1, 11)]
+
+
+def test_partial_batch_is_encoded_after_max_wait(pool):
+    encoder = RecordingEncoder()
+
+    async def scenario(batcher):
+        first = asyncio.create_task(batcher.embed("early"))
+        await asyncio.sleep(0.2)  # well past max_wait_ms
+        assert first.done()
+        return await asyncio.gather(first, batcher.embed("late"))
+
+    run_with_batcher(pool, encoder, scenario, max_batch_size=4, max_wait_ms=20)
+    assert encoder.batches == [["early"], ["late"]]
+
+
+def test_encode_failure_reaches_every_caller(pool):
+    def failing_encoder(texts):
+        raise RuntimeError("out of memory")
+
+    async def scenario(batcher):
+        return await asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True)
+
+    results = run_with_batcher(pool, failing_encoder, scenario)
+    assert [str(result) for result in results] == ["out of memory", "out of memory"]
+
+
+def test_full_queue_raises_saturated_error(pool):
+    encoder = RecordingEncoder()
+
+    async def scenario(batcher):
+        # Stop the worker so nothing drains the queue
+        await batcher.stop()
+        waiting = [asyncio.create_task(batcher.embed("queued")) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(SaturatedError):
+            await batcher.embed("one too many")
+        for task in waiting:
+            task.cancel()
+
+    run_with_batcher(pool, encoder, scenario, max_queue_size=2)
+    assert encoder.batches == []
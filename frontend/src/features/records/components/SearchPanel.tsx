@@ -10,6 +10,8 @@ import { CalendarIcon } from 'lucide-react'
 import TagAutocomplete from '@/features/tags/TagAutocomplete'
 import { useTags } from '../../tags/hooks/useTags'
 import { SearchRequest } from '@/lib/api'
+import { Link } from 'react-router-dom'
+import { useSearchSuggest } from '../hooks/useSearchSuggest'
 
 interface Props {
   onSearch: (data: SearchRequest) => void
@@ -20,6 +22,7 @@ export default function SearchPanel({ onSearch }: Props) {
     defaultValues: { query: '', tags: [], start_date: undefined, end_date: undefined }
   })
   const tagsQuery = useTags()
+  const suggestions = useSearchSuggest(watch('query'))
 
   const onSubmit = (data: SearchRequest) => {
     onSearch(data)
@@ -29,7 +32,27 @@ export default function SearchPanel({ onSearch }: Props) {
     <form onSubmit={handleSubmit(onSubmit)} className="space-y-4 p-4">
       <div>
         <Label htmlFor="query">Search</Label>
-        <Input id="query" {...register('query')} placeholder="Search text input..." />
+        <Input id="query" {...register('query')} placeholder="Search text input..." autoComplete="off" />
+        {suggestions.data && (suggestions.data.records.length > 0 || suggestions.data.tags.length > 0) && (
+          <ul className="mt-1 space-y-1 text-sm">
+            {suggestions.data.records.map(record => (
+              <li key={record.id}>
+                <Link to={`/view/${record.id}`} className="text-primary hover:underline">{record.name}</Link>
+              </li>
+            ))}
+            {suggestions.data.tags.map(tag => (
+              <li key={tag}>
+                <button
+                  type="button"
+                  className="text-subtext hover:underline"
+                  onClick={() => setValue('tags', Array.from(new Set([...watch('tags'), tag])))}
+                >
+                  #{tag}
+                </button>
+              </li>
+            ))}
+          </ul>
+        )}
       </div>
       <div className="flex flex-wrap gap-4">
         <div>
@@ -0,0 +1,22 @@
+import { useEffect, useState } from 'react'
+import { useQuery } from '@tanstack/react-query'
+import { suggestSearch } from '@/lib/api'
+
+const DEBOUNCE_MS = 200
+
+// Search-as-you-type: asks /search/suggest once typing pauses
+export const useSearchSuggest = (query: string) => {
+  const [debounced, setDebounced] = useState(query)
+
+  useEffect(() => {
+    const timer = setTimeout(() => setDebounced(query), DEBOUNCE_MS)
+    return () => clearTimeout(timer)
+  }, [query])
+
+  return useQuery({
+    queryKey: ['suggest', debounced],
+    queryFn: ({ signal }) => suggestSearch(debounced, signal),
+    enabled: debounced.trim() !== '',
+    staleTime: 30_000,
+  })
+}
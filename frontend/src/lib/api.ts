@@ -40,6 +40,8 @@ export const refreshAccessToken = async (): Promise<string | null> => {
   const data = await response.json();
   const newAccessToken = data.access_token;
   localStorage.setItem('access_token', newAccessToken);
+  // Refresh tokens are single-use; the response carries the rotated one
+  if (data.refresh_token) localStorage.setItem('refresh_token', data.refresh_token);
   if (authTokenSetter) authTokenSetter(newAccessToken);
   return newAccessToken;
 };
@@ -123,10 +125,17 @@ export interface SearchRequest {
   start_date?: string
   end_date?: string
   tags: string[]
+  mode?: 'semantic' | 'hybrid' | 'lexical'
 }
 
 export interface SearchResponse extends Omit<RecordResponse, 'user_id'> {
-  distance: number
+  distance: number | null
+  score: number | null
+}
+
+export interface SuggestResponse {
+  records: { id: string; name: string }[]
+  tags: string[]
 }
 
 interface TagResponse {
@@ -146,5 +155,9 @@ export const updateRecord = (id: string, data: RecordUpdate): Promise<RecordResp
 export const searchRecords = (params: SearchRequest): Promise<SearchResponse[]> =>
   apiFetch(`/search/`, { method: 'POST', body: JSON.stringify(params) })
 
+// Typeahead matches; also warms the backend's embedding cache for the eventual search
+export const suggestSearch = (q: string, signal?: AbortSignal): Promise<SuggestResponse> =>
+  apiFetch(`/search/suggest?q=${encodeURIComponent(q)}`, { signal })
+
 export const getTags = (): Promise<string[]> =>
   apiFetch<TagResponse[]>('/tags/').then(tags => tags.map(t => t.name))
\ No newline at end of file